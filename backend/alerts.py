@@ -0,0 +1,153 @@
+"""
+Incremental low-stock alerts (current_stock below Material.min_stock_level).
+
+Each worker keeps the set of materials currently below threshold in memory. It is
+loaded once with a range scan on ix_materials_stock_headroom
+(current_stock - min_stock_level < 0), so the cost is proportional to the number of
+alerts, not the catalogue size. After that only materials whose stock or threshold
+just changed are re-checked:
+
+- observe(): balances already known by the caller (issue approval, final approval);
+  thresholds come from the material master cache, so no extra query.
+- recheck(): ids only (threshold edits, new materials); one primary-key IN query.
+
+Transitions are pushed as "low-stock" events (added / updated / removed). Changes made
+by other workers are picked up by a periodic reload (LOW_STOCK_RESYNC_SECONDS).
+"""
+import os
+import threading
+import time
+from typing import Iterable
+
+from sqlalchemy.orm import Session
+
+from backend import events, models
+from backend.material_cache import material_cache
+
+ALERT_ROLES = (models.UserRole.STORE_MANAGER, models.UserRole.OFFICER)
+
+
+def _alert(material_id, code, name, category, unit, current_stock, min_stock_level):
+    return {
+        "material_id": material_id,
+        "material_code": code,
+        "material_name": name,
+        "category": category,
+        "unit": unit,
+        "current_stock": current_stock,
+        "min_stock_level": min_stock_level,
+        "shortfall": min_stock_level - current_stock,
+    }
+
+
+def _is_low(current_stock, min_stock_level) -> bool:
+    return current_stock is not None and min_stock_level is not None and current_stock < min_stock_level
+
+
+_ALERT_COLUMNS = (
+    models.Material.id,
+    models.Material.code,
+    models.Material.name,
+    models.Material.category,
+    models.Material.unit,
+    models.Material.current_stock,
+    models.Material.min_stock_level,
+)
+
+
+class LowStockAlerts:
+    def __init__(self, resync_seconds: float = 30.0):
+        self.resync_seconds = resync_seconds
+        self.checks = 0
+        self.reloads = 0
+        self._alerts = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def load(self, db: Session):
+        """(Re)build the alert set from the headroom index"""
+        headroom = models.Material.current_stock - models.Material.min_stock_level
+        rows = db.query(*_ALERT_COLUMNS).filter(headroom < 0).all()
+        with self._lock:
+            self._alerts = {row.id: _alert(*row) for row in rows}
+            self._loaded_at = time.monotonic()
+            self.reloads += 1
+
+    def _ensure_loaded(self, db: Session):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at >= self.resync_seconds:
+            self.load(db)
+
+    def _apply(self, current: dict):
+        """Swap in the new state of the given materials (None = not low) and push the transitions"""
+        changes = []
+        with self._lock:
+            self.checks += len(current)
+            for material_id, alert in current.items():
+                previous = self._alerts.get(material_id)
+                if alert is None:
+                    if previous is not None:
+                        del self._alerts[material_id]
+                        changes.append(("removed", material_id, previous))
+                elif previous is None:
+                    self._alerts[material_id] = alert
+                    changes.append(("added", material_id, alert))
+                elif previous != alert:
+                    self._alerts[material_id] = alert
+                    changes.append(("updated", material_id, alert))
+        for action, material_id, alert in changes:
+            events.notify(
+                "low-stock", action, material_id, roles=ALERT_ROLES,
+                current_stock=alert["current_stock"], min_stock_level=alert["min_stock_level"],
+            )
+        return changes
+
+    def observe(self, db: Session, stocks: dict):
+        """Re-check materials whose new balances the caller already knows (material_id -> current_stock)"""
+        if not stocks or self._loaded_at is None:
+            self._ensure_loaded(db)
+            return []
+        masters = material_cache.get_many(db, stocks.keys())
+        current = {}
+        for material_id, stock in stocks.items():
+            master = masters.get(material_id)
+            if master is not None and _is_low(stock, master.min_stock_level):
+                current[material_id] = _alert(
+                    master.id, master.code, master.name, master.category, master.unit, stock, master.min_stock_level
+                )
+            else:
+                current[material_id] = None
+        return self._apply(current)
+
+    def recheck(self, db: Session, material_ids: Iterable[int]):
+        """Re-read and re-check the given materials with one IN query"""
+        wanted = {material_id for material_id in material_ids if material_id is not None}
+        if not wanted or self._loaded_at is None:
+            self._ensure_loaded(db)
+            return []
+        rows = db.query(*_ALERT_COLUMNS).filter(models.Material.id.in_(wanted)).all()
+        current = dict.fromkeys(wanted)
+        for row in rows:
+            if _is_low(row.current_stock, row.min_stock_level):
+                current[row.id] = _alert(*row)
+        return self._apply(current)
+
+    def active(self, db: Session) -> list:
+        """Materials below threshold, largest shortfall first"""
+        self._ensure_loaded(db)
+        with self._lock:
+            alerts = list(self._alerts.values())
+        return sorted(alerts, key=lambda alert: (-alert["shortfall"], alert["material_id"]))
+
+    def stats(self):
+        return {
+            "active": len(self._alerts),
+            "checks": self.checks,
+            "reloads": self.reloads,
+            "resync_seconds": self.resync_seconds,
+        }
+
+
+low_stock_alerts = LowStockAlerts(
+    resync_seconds=float(os.getenv("LOW_STOCK_RESYNC_SECONDS", "30"))
+)
@@ -0,0 +1,53 @@
+"""
+AsyncSession variants of the read paths behind the list endpoints (ASYNC_DB=1).
+
+They execute the same statements as their crud counterparts, so filtering, ordering,
+keyset pagination and eager loading stay defined in one place.
+"""
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend import crud, models
+
+
+async def get_resource_version(db: AsyncSession, name: str):
+    row = (await db.execute(crud.resource_version_statement(name))).first()
+    return (row.version, row.updated_at) if row else (0, None)
+
+
+async def get_user_by_username(db: AsyncSession, username: str):
+    return await db.scalar(crud.user_by_username_statement(username))
+
+
+async def get_pending_gate_entries_for_officer(db: AsyncSession, officer_id: int, cursor: Optional[str] = None,
+                                               limit: Optional[int] = None):
+    return (await db.scalars(crud.pending_gate_entries_statement(officer_id, cursor, limit))).all()
+
+
+async def get_pending_store_entries(db: AsyncSession, cursor: Optional[str] = None, limit: Optional[int] = None):
+    return (await db.scalars(crud.pending_store_entries_statement(cursor, limit))).all()
+
+
+async def get_pending_issues(db: AsyncSession, officer_id: int):
+    return (await db.scalars(crud.pending_issues_statement(officer_id))).all()
+
+
+async def get_officer_approved_issues(db: AsyncSession, officer_id: int, cursor: Optional[str] = None,
+                                      limit: Optional[int] = None):
+    return (await db.scalars(crud.approved_issues_statement(officer_id, cursor, limit))).all()
+
+
+async def get_materials(db: AsyncSession, cursor: Optional[str] = None, limit: Optional[int] = None,
+                        search: Optional[str] = None, category: Optional[str] = None):
+    return (await db.scalars(crud.materials_statement(cursor, limit, search, category))).all()
+
+
+async def get_store_items(db: AsyncSession, user: models.User, cursor: Optional[str] = None,
+                          limit: Optional[int] = None, officer_id: Optional[int] = None):
+    results = (await db.scalars(crud.store_items_statement(user, cursor, limit, officer_id))).all()
+    return crud.store_item_responses(user, results)
+
+
+async def get_issue_history(db: AsyncSession, user_id: int, cursor: Optional[str] = None, limit: Optional[int] = None):
+    return (await db.scalars(crud.issue_history_statement(user_id, cursor, limit))).all()
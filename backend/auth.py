@@ -3,15 +3,64 @@ from typing import Optional
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
 from backend import crud, database, schemas, models
+from backend.cache import TTLCache
+
+import os
 
 SECRET_KEY = "super-secret-key-change-this-in-prod"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Single-purpose tokens for opening /events/stream, which has to take them in the URL
+STREAM_TOKEN_SCOPE = "event-stream"
+STREAM_TOKEN_EXPIRE_SECONDS = int(os.getenv("STREAM_TOKEN_EXPIRE_SECONDS", "60"))
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Principal cache: token subject (username) -> detached User row.
+# Entries are dropped once a transaction that inserted/updated/deleted the User row commits
+# in this process (dropping at flush would let a concurrent miss re-cache the old row);
+# the TTL bounds how long another worker's change (e.g. is_active flip) can go unnoticed.
+principal_cache = TTLCache(
+    maxsize=int(os.getenv("PRINCIPAL_CACHE_MAX_SIZE", "1024")),
+    ttl=float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60")),
+)
+
+PRINCIPAL_EVICTIONS_KEY = "principal_evictions"
+
+def invalidate_principal(username: Optional[str] = None):
+    """Drop one cached principal, or all of them when no username is given"""
+    if username is None:
+        principal_cache.clear()
+    else:
+        principal_cache.pop(username)
+
+@event.listens_for(models.User, "after_insert")
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _collect_principal_change(mapper, connection, target):
+    session = object_session(target)
+    usernames = {target.username}
+    # A rename leaves the old username cached as well
+    usernames.update(inspect(target).attrs.username.history.deleted or ())
+    if session is None:
+        for username in usernames:
+            invalidate_principal(username)
+    else:
+        session.info.setdefault(PRINCIPAL_EVICTIONS_KEY, set()).update(usernames)
+
+@event.listens_for(Session, "after_commit")
+def _evict_principals_after_commit(session):
+    for username in session.info.pop(PRINCIPAL_EVICTIONS_KEY, ()):
+        invalidate_principal(username)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_principal_evictions(session):
+    session.info.pop(PRINCIPAL_EVICTIONS_KEY, None)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -22,26 +71,91 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
-    credentials_exception = HTTPException(
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _token_subject(token: str, scope: Optional[str] = None) -> str:
+    """Username of a valid token; access tokens carry no scope, stream tokens only open streams"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
+        if username is None or payload.get("scope") != scope:
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
-    
+        raise _credentials_exception()
+    return username
+
+def create_stream_token(username: str) -> str:
+    return create_access_token(
+        {"sub": username, "scope": STREAM_TOKEN_SCOPE}, expires_delta=timedelta(seconds=STREAM_TOKEN_EXPIRE_SECONDS)
+    )
+
+def get_user_from_token(token: str, db: Session, scope: Optional[str] = None):
+    username = _token_subject(token, scope)
+    user = principal_cache.get(username)
+    if user is not None:
+        return user
+
     user = crud.get_user_by_username(db, username=username)
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    # Detach so the cached row is not expired by this request's commits
+    db.expunge(user)
+    principal_cache.set(username, user)
     return user
 
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+    return get_user_from_token(token, db)
+
 def get_current_active_user(current_user: models.User = Depends(get_current_user)):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db=Depends(database.get_async_db)):
+    """get_current_user for async handlers: cache hits need no session, misses use the AsyncSession"""
+    from backend import async_crud
+
+    username = _token_subject(token)
+    user = principal_cache.get(username)
+    if user is not None:
+        return user
+
+    user = await async_crud.get_user_by_username(db, username)
+    if user is None:
+        raise _credentials_exception()
+    db.expunge(user)
+    principal_cache.set(username, user)
+    return user
+
+async def get_current_active_user_async(current_user: models.User = Depends(get_current_user_async)):
+    return get_current_active_user(current_user)
+
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
+
+def get_stream_user(token: Optional[str] = None, header_token: Optional[str] = Depends(optional_oauth2_scheme)):
+    """
+    Auth for long-lived streams. Browsers' EventSource cannot send headers, so ?token= is
+    accepted too, but only a short-lived stream token (POST /events/stream-token): the
+    access token itself never ends up in proxy or access logs. Uses a short-lived session
+    so no connection is held for the lifetime of the stream.
+    """
+    if not header_token and not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    db = database.SessionLocal()
+    try:
+        if header_token:
+            user = get_user_from_token(header_token, db)
+        else:
+            user = get_user_from_token(token, db, scope=STREAM_TOKEN_SCOPE)
+    finally:
+        db.close()
+    return get_current_active_user(user)
@@ -2,20 +2,138 @@ from sqlalchemy.orm import Session
 from backend.models import User, GateEntry, UserRole, InwardProcess, InwardItem
 from backend import schemas
 from backend import models
-from passlib.context import CryptContext
+from backend import events
+from backend import lots
+from backend.material_cache import material_cache, MATERIAL_MASTER_RESOURCE
+from backend.alerts import low_stock_alerts
+from backend.hashing import pwd_context, hash_password, check_password
+from backend.pagination import Keyset
+from backend.cache import TTLCache
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import joinedload
+from typing import Optional
 import uuid
 import datetime
+import logging
+import time
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
+
+# Keyset pagination orderings for the list endpoints
+GATE_ENTRY_KEYSET = Keyset(GateEntry.id)
+MATERIAL_KEYSET = Keyset(models.Material.id)
+STORE_ITEM_KEYSET = Keyset(models.StoreInventory.id)
+APPROVED_ISSUE_KEYSET = Keyset(models.MaterialIssue.approval_order, models.MaterialIssue.id, descending=True)
+ISSUE_HISTORY_KEYSET = Keyset(models.MaterialIssue.id, descending=True)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return hash_password(password)
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return check_password(plain_password, hashed_password)
+
+# --- Resource Versions (ETag support) ---
+
+MATERIALS_RESOURCE = "materials"
+STORE_ITEMS_RESOURCE = "store-items"
+
+RESOURCE_BUMPS_KEY = "pending_resource_bumps"
+
+def bump_resource_version(db: Session, *names: str):
+    """
+    Schedule change counter increments for the write's commit. They are applied inside
+    the same transaction, just before it commits, so the data and its version change
+    together and the hot counter rows are only locked for the commit itself.
+    """
+    db.info.setdefault(RESOURCE_BUMPS_KEY, set()).update(names)
+
+def _apply_resource_bumps(db: Session, names):
+    from sqlalchemy import update
+
+    table = models.ResourceVersion.__table__
+    # Fixed order, so concurrent commits lock the counter rows without deadlocking
+    for name in sorted(names):
+        result = db.execute(
+            update(table).where(table.c.name == name)
+            .values(version=table.c.version + 1, updated_at=models.get_ist_now())
+        )
+        if result.rowcount == 0:
+            db.execute(table.insert().values(name=name, version=1, updated_at=models.get_ist_now()))
+
+@event.listens_for(Session, "before_commit")
+def _bump_before_commit(session):
+    session.flush()  # flush-time hooks (e.g. user renames) may still schedule bumps
+    names = session.info.pop(RESOURCE_BUMPS_KEY, None)
+    if names:
+        _apply_resource_bumps(session, names)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_bumps(session):
+    session.info.pop(RESOURCE_BUMPS_KEY, None)
+
+def init_resource_versions(db: Session):
+    """Create missing counter rows up front so concurrent first bumps never race on insert"""
+    table = models.ResourceVersion.__table__
+    existing = {name for (name,) in db.execute(table.select().with_only_columns(table.c.name))}
+    for name in (MATERIALS_RESOURCE, STORE_ITEMS_RESOURCE, MATERIAL_MASTER_RESOURCE):
+        if name not in existing:
+            db.execute(table.insert().values(name=name, version=0, updated_at=models.get_ist_now()))
+    db.commit()
+
+def resource_version_statement(name: str):
+    table = models.ResourceVersion.__table__
+    return select(table.c.version, table.c.updated_at).where(table.c.name == name)
+
+def get_resource_version(db: Session, name: str):
+    """(version, updated_at) for a resource via a single Core primary-key lookup"""
+    row = db.execute(resource_version_statement(name)).first()
+    return (row.version, row.updated_at) if row else (0, None)
+
+# --- Username resolution (approver names etc.) ---
+
+username_cache = TTLCache(maxsize=512, ttl=600)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_username(mapper, connection, target):
+    username_cache.pop(target.id)
+
+@event.listens_for(User, "after_update")
+def _reproject_officer_name(mapper, connection, target):
+    """The store inventory projection denormalises officer_name: follow renames in the same transaction"""
+    from sqlalchemy import inspect, update
+    from sqlalchemy.orm import object_session
+
+    if inspect(target).attrs.username.history.has_changes():
+        bump_resource_version(object_session(target), STORE_ITEMS_RESOURCE)
+        connection.execute(
+            update(models.StoreInventory.__table__)
+            .where(models.StoreInventory.__table__.c.officer_id == target.id)
+            .values(officer_name=target.username)
+        )
+
+def resolve_usernames(db: Session, user_ids) -> dict:
+    """user id -> username; cache misses are fetched with one IN query"""
+    found, missing = {}, set()
+    for user_id in set(user_ids):
+        if user_id is None:
+            continue
+        username = username_cache.get(user_id)
+        if username is None:
+            missing.add(user_id)
+        else:
+            found[user_id] = username
+    if missing:
+        for user_id, username in db.query(User.id, User.username).filter(User.id.in_(missing)):
+            username_cache.set(user_id, username)
+            found[user_id] = username
+    return found
+
+def user_by_username_statement(username: str):
+    return select(User).where(User.username == username)
 
 def get_user_by_username(db: Session, username: str):
-    return db.query(User).filter(User.username == username).first()
+    return db.scalar(user_by_username_statement(username))
 
 def create_user(db: Session, user: schemas.UserCreate):
     hashed_password = get_password_hash(user.password)
@@ -31,6 +149,17 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.refresh(db_user)
     return db_user
 
+def get_user_counts(db: Session) -> dict:
+    """Active / inactive users per role, counted in the database (no user rows loaded)"""
+    rows = db.query(models.User.role, models.User.is_active, func.count()).group_by(
+        models.User.role, models.User.is_active
+    ).all()
+    counts = {}
+    for role, is_active, count in rows:
+        by_role = counts.setdefault(role, {"active": 0, "inactive": 0})
+        by_role["active" if is_active else "inactive"] += count
+    return counts
+
 def get_all_officers(db: Session):
     """Get all active officers for dropdown selection"""
     return db.query(models.User).filter(
@@ -75,26 +204,53 @@ def create_gate_entry(db: Session, entry: schemas.GateEntryCreate, created_by_id
     db.add(db_entry)
     db.commit()
     db.refresh(db_entry)
+    events.notify("pending-stage-1", "added", db_entry.id, users=[db_entry.request_officer_id], status=db_entry.status)
     return db_entry
 
-def get_pending_gate_entries_for_officer(db: Session, officer_id: int):
-    return db.query(GateEntry).filter(
+def pending_gate_entries_statement(officer_id: int, cursor: Optional[str] = None, limit: Optional[int] = None):
+    statement = select(GateEntry).where(
         GateEntry.request_officer_id == officer_id,
         GateEntry.status == "PENDING_OFFICER_APPROVAL_1"
-    ).all()
+    )
+    return GATE_ENTRY_KEYSET.apply(statement, cursor, limit)
+
+def get_pending_gate_entries_for_officer(db: Session, officer_id: int, cursor: Optional[str] = None, limit: Optional[int] = None):
+    return db.scalars(pending_gate_entries_statement(officer_id, cursor, limit)).all()
 
 def update_gate_entry_status(db: Session, entry: GateEntry, status: str):
     entry.status = status
     db.commit()
     db.refresh(entry)
+    events.notify("pending-stage-1", "removed", entry.id, users=[entry.request_officer_id], status=status)
+    events.notify("gate-entries", "updated", entry.id, users=[entry.created_by_id], status=status)
+    if status == "APPROVED_STAGE_1":
+        events.notify("store-pending", "added", entry.id, roles=[UserRole.STORE_MANAGER], status=status)
     return entry
 
-def get_pending_store_entries(db: Session):
-    return db.query(GateEntry).filter(
+def pending_store_entries_statement(cursor: Optional[str] = None, limit: Optional[int] = None):
+    statement = select(GateEntry).where(
         GateEntry.status == "APPROVED_STAGE_1"
-    ).all()
+    )
+    return GATE_ENTRY_KEYSET.apply(statement, cursor, limit)
+
+def get_pending_store_entries(db: Session, cursor: Optional[str] = None, limit: Optional[int] = None):
+    return db.scalars(pending_store_entries_statement(cursor, limit)).all()
+
+def process_store_entry(db: Session, entry_id: int, data: schemas.InwardProcessCreate, user_id: int, timings: Optional[dict] = None):
+    """
+    Record the store manager's verification. Items are bulk-inserted and linked Material
+    master rows updated in batch. If `timings` is given it is filled with per-phase durations (ms).
+    """
+    from sqlalchemy import insert, update
+
+    started = phase_started = time.perf_counter()
+    def mark(phase):
+        nonlocal phase_started
+        now = time.perf_counter()
+        if timings is not None:
+            timings[phase] = round((now - phase_started) * 1000, 2)
+        phase_started = now
 
-def process_store_entry(db: Session, entry_id: int, data: schemas.InwardProcessCreate, user_id: int):
     # 1. Verify Entry
     entry = db.query(GateEntry).filter(GateEntry.id == entry_id).first()
     if not entry or entry.status != "APPROVED_STAGE_1":
@@ -114,42 +270,76 @@ def process_store_entry(db: Session, entry_id: int, data: schemas.InwardProcessC
     )
     db.add(inward_process)
     db.flush() # Get ID
-    
-    # 3. Add Items
+    mark("process")
+
+    # 3. Resolve all referenced materials (master cache, misses in one query)
+    existing_materials = material_cache.get_many(db, (item.material_id for item in data.items))
+    mark("resolve")
+    
+    # 4. Add Items (single executemany)
+    if data.items:
+        db.execute(insert(models.InwardItem), [
+            {
+                "inward_process_id": inward_process.id,
+                "material_id": item.material_id,
+                "quantity_received": item.quantity_received,
+                "store_room": item.store_room,
+                "rack_no": item.rack_no,
+                "shelf_no": item.shelf_no,
+                # Save directly to Item
+                "material_description": item.material_description,
+                "material_category": item.material_category,
+                "material_unit": item.material_unit,
+                "min_stock_level": item.min_stock_level,
+            }
+            for item in data.items
+        ])
+    mark("items")
+
+    # 5. Update Material Master if linked (Backwards compatibility or if we re-enable linking)
+    # Later lines win, matching the old line-by-line behaviour.
+    master_updates = {}
     for item in data.items:
-        db_item = models.InwardItem(
-            inward_process_id=inward_process.id,
-            material_id=item.material_id,
-            quantity_received=item.quantity_received,
-            store_room=item.store_room,
-            rack_no=item.rack_no,
-            shelf_no=item.shelf_no,
-            # Save directly to Item
-            material_description=item.material_description,
-            material_category=item.material_category,
-            material_unit=item.material_unit,
-            min_stock_level=item.min_stock_level
-        )
-        db.add(db_item)
-
-        # Update Material Master if linked (Backwards compatibility or if we re-enable linking)
-        if item.material_id:
-            material = db.query(models.Material).filter(models.Material.id == item.material_id).first()
-            if material:
-                if item.material_description:
-                    material.description = item.material_description
-                if item.material_category:
-                    material.category = item.material_category
-                if item.material_unit:
-                    material.unit = item.material_unit
-                if item.min_stock_level is not None:
-                    material.min_stock_level = item.min_stock_level
-    
-    # 4. Update Main Entry Status
+        if item.material_id not in existing_materials:
+            continue
+        changes = master_updates.setdefault(item.material_id, {"id": item.material_id})
+        if item.material_description:
+            changes["description"] = item.material_description
+        if item.material_category:
+            changes["category"] = item.material_category
+        if item.material_unit:
+            changes["unit"] = item.material_unit
+        if item.min_stock_level is not None:
+            changes["min_stock_level"] = item.min_stock_level
+    master_updates = [changes for changes in master_updates.values() if len(changes) > 1]
+    if master_updates:
+        updated_ids = [changes["id"] for changes in master_updates]
+        db.execute(update(models.Material), master_updates)
+        # Approved stock of these materials shows master category/unit: re-project it
+        refresh_store_inventory(db, material_ids=updated_ids)
+        bump_resource_version(db, MATERIALS_RESOURCE, STORE_ITEMS_RESOURCE, MATERIAL_MASTER_RESOURCE)
+    mark("materials")
+    
+    # 6. Update Main Entry Status
     entry.status = "PENDING_OFFICER_FINAL_APPROVAL"
     
-    db.commit()
+    try:
+        db.commit()
+    except Exception:
+        # Nothing uncommitted reached the cache, but drop the ids anyway so no stale master survives
+        db.rollback()
+        if master_updates:
+            material_cache.invalidate(updated_ids)
+        raise
     db.refresh(entry)
+    if master_updates:
+        material_cache.invalidate(updated_ids)
+        low_stock_alerts.recheck(db, updated_ids)
+    mark("commit")
+    events.notify("store-pending", "removed", entry.id, roles=[UserRole.STORE_MANAGER], status=entry.status)
+    events.notify("final-pending", "added", entry.id, users=[entry.request_officer_id], status=entry.status)
+    if timings is not None:
+        timings["total"] = round((time.perf_counter() - started) * 1000, 2)
     return entry
 
 def get_pending_final_approval_entries(db: Session, officer_id: int):
@@ -163,40 +353,79 @@ def get_pending_final_approval_entries(db: Session, officer_id: int):
     ).all()
 
 def final_approve_gate_entry(db: Session, entry_id: int, officer_id: int):
-    entry = db.query(GateEntry).filter(GateEntry.id == entry_id).first()
+    from sqlalchemy.orm import joinedload, selectinload
+    from sqlalchemy import bindparam, insert, update
+
+    entry = db.query(GateEntry).options(
+        joinedload(GateEntry.inward_process).selectinload(models.InwardProcess.items)
+    ).filter(GateEntry.id == entry_id).first()
     
     if not entry or entry.status != "PENDING_OFFICER_FINAL_APPROVAL":
         return None
     
     # 1. Update InwardProcess
     inward = entry.inward_process
+    balances = {}
     if inward:
         inward.final_approved_by_id = officer_id
         inward.final_approved_at = datetime.datetime.now()
         
-        # 2. Update Stock & Create Logs
-        for item in inward.items:
-            # Update Material Stock
-            material = db.query(models.Material).filter(models.Material.id == item.material_id).first()
-            if material:
-                material.current_stock += item.quantity_received
-                
-                # Create Log
-                log = models.InventoryLog(
-                    material_id=material.id,
-                    change_quantity=item.quantity_received,
-                    balance_after=material.current_stock,
-                    transaction_type="INWARD",
-                    reference_id=entry.gate_pass_number,
-                    created_by_id=officer_id
-                )
-                db.add(log)
-    
-    # 3. Update Status
+        # 2. Update Stock & Create Logs (constant number of statements regardless of line count)
+        linked_items = [item for item in inward.items if item.material_id]
+        totals = {}
+        for item in linked_items:
+            totals[item.material_id] = totals.get(item.material_id, 0) + item.quantity_received
+
+        if totals:
+            # Atomic increments in one executemany, so concurrent issues are never overwritten
+            materials = models.Material.__table__
+            db.execute(
+                update(materials)
+                .where(materials.c.id == bindparam("b_id"))
+                .values(current_stock=materials.c.current_stock + bindparam("b_qty")),
+                [{"b_id": material_id, "b_qty": qty} for material_id, qty in totals.items()]
+            )
+            # Read back post-update balances with one IN query
+            balances = dict(db.query(models.Material.id, models.Material.current_stock).filter(
+                models.Material.id.in_(totals.keys())
+            ).all())
+
+            # Running balance per log row, ending at the post-update balance
+            running = {
+                material_id: balance - totals[material_id]
+                for material_id, balance in balances.items()
+            }
+            logs = []
+            for item in linked_items:
+                if item.material_id not in running:
+                    continue  # Material no longer exists
+                running[item.material_id] += item.quantity_received
+                logs.append({
+                    "material_id": item.material_id,
+                    "change_quantity": item.quantity_received,
+                    "balance_after": running[item.material_id],
+                    "transaction_type": "INWARD",
+                    "reference_id": entry.gate_pass_number,
+                    "created_by_id": officer_id,
+                })
+            if logs:
+                db.execute(insert(models.InventoryLog), logs)
+            # Each received line becomes a lot that issues are allocated from
+            lot_rows = lots.lot_rows(inward, [item for item in linked_items if item.material_id in running])
+            if lot_rows:
+                db.execute(insert(models.StockLot), lot_rows)
+            bump_resource_version(db, MATERIALS_RESOURCE)
+    
+    # 3. Update Status & project the items into the store inventory
     entry.status = "FINAL_APPROVED"
+    db.flush()
+    refresh_store_inventory(db, gate_entry_ids=[entry.id])
+    bump_resource_version(db, STORE_ITEMS_RESOURCE)
     
     db.commit()
-    db.commit()
+    events.notify("final-pending", "removed", entry.id, users=[entry.request_officer_id], status="FINAL_APPROVED")
+    events.notify("store-items", "updated", entry.id, users=[entry.request_officer_id], roles=[UserRole.STORE_MANAGER])
+    low_stock_alerts.observe(db, balances)
     return entry
 
 def reject_gate_entry_final(db: Session, entry_id: int, officer_id: int, remarks: str):
@@ -219,9 +448,76 @@ def reject_gate_entry_final(db: Session, entry_id: int, officer_id: int, remarks
         
     db.commit()
     db.refresh(entry)
+    events.notify("final-pending", "removed", entry.id, users=[entry.request_officer_id], status="REJECTED")
     return entry
 
-def update_inward_process(db: Session, entry_id: int, update_data: schemas.InwardProcessUpdate):
+# Fields an officer may correct on the verification screen
+INWARD_ITEM_EDITABLE_FIELDS = (
+    "quantity_received", "store_room", "rack_no", "shelf_no",
+    "material_description", "material_category", "material_unit",
+)
+
+class StockCorrectionError(Exception):
+    """A quantity correction on a final-approved item cannot be posted"""
+
+def _post_quantity_corrections(db: Session, entry: GateEntry, items, deltas: dict, user_id: Optional[int]) -> dict:
+    """
+    Post quantity corrections of final-approved items: the stock was already received, so
+    the difference goes to the material, its lot and the ledger (ADJUSTMENT) in the
+    caller's transaction. Returns material_id -> new balance.
+    """
+    from sqlalchemy import update
+
+    lot_table = models.StockLot.__table__
+    material_table = models.Material.__table__
+    balances = {}
+    for item_id, delta in deltas.items():
+        material_id = items[item_id].material_id
+        if not material_id or not delta:
+            continue
+        # Cannot shrink a lot below what has already been issued from it
+        lot_update = db.execute(
+            update(lot_table)
+            .where(lot_table.c.id == item_id, lot_table.c.quantity_remaining + delta >= 0)
+            .values(
+                quantity_received=lot_table.c.quantity_received + delta,
+                quantity_remaining=lot_table.c.quantity_remaining + delta,
+            )
+        )
+        if lot_update.rowcount != 1 and db.get(models.StockLot, item_id) is not None:
+            raise StockCorrectionError(f"Item {item_id}: more than the corrected quantity has already been issued")
+        stock_update = (
+            update(material_table)
+            .where(material_table.c.id == material_id, material_table.c.current_stock + delta >= 0)
+            .values(current_stock=material_table.c.current_stock + delta)
+        )
+        if db.get_bind().dialect.update_returning:
+            balance = db.execute(stock_update.returning(material_table.c.current_stock)).scalar()
+        else:
+            balance = None
+            if db.execute(stock_update).rowcount == 1:
+                balance = db.query(models.Material.current_stock).filter(models.Material.id == material_id).scalar()
+        if balance is None:
+            raise StockCorrectionError(f"Item {item_id}: correcting the quantity would make the stock negative")
+        db.add(models.InventoryLog(
+            material_id=material_id,
+            change_quantity=delta,
+            balance_after=balance,
+            transaction_type="ADJUSTMENT",
+            reference_id=entry.gate_pass_number,
+            created_by_id=user_id,
+        ))
+        balances[material_id] = balance
+    return balances
+
+def update_inward_process(db: Session, entry_id: int, update_data: schemas.InwardProcessUpdate,
+                          user_id: Optional[int] = None):
+    """
+    Apply the officer's corrections. Quantity changes on a FINAL_APPROVED entry are posted
+    to stock, lots and ledger; raises StockCorrectionError (nothing saved) when they cannot be.
+    """
+    from sqlalchemy import update
+
     entry = db.query(GateEntry).filter(GateEntry.id == entry_id).first()
     if not entry or not entry.inward_process:
         return None
@@ -236,27 +532,46 @@ def update_inward_process(db: Session, entry_id: int, update_data: schemas.Inwar
     if update_data.remarks is not None:
         inward.remarks = update_data.remarks
         
-    # Update Items
+    # Update Items: load the process's items once, then send only real changes in one bulk UPDATE
+    items_by_id = {item.id: item for item in inward.items}
+    changed_rows = []
     for item_update in update_data.items:
-        # Find the item
-        item = db.query(models.InwardItem).filter(models.InwardItem.id == item_update.id, models.InwardItem.inward_process_id == inward.id).first()
-        if item:
-            if item_update.quantity_received is not None:
-                item.quantity_received = item_update.quantity_received
-            if item_update.store_room is not None:
-                item.store_room = item_update.store_room
-            if item_update.rack_no is not None:
-                item.rack_no = item_update.rack_no
-            if item_update.shelf_no is not None:
-                item.shelf_no = item_update.shelf_no
-            if item_update.material_description is not None:
-                item.material_description = item_update.material_description
-            if item_update.material_category is not None:
-                item.material_category = item_update.material_category
-            if item_update.material_unit is not None:
-                item.material_unit = item_update.material_unit
+        item = items_by_id.get(item_update.id)
+        if not item:
+            continue
+        changes = {
+            field: getattr(item_update, field)
+            for field in INWARD_ITEM_EDITABLE_FIELDS
+            if getattr(item_update, field) is not None and getattr(item_update, field) != getattr(item, field)
+        }
+        if changes:
+            changed_rows.append({"id": item.id, **changes})
+
+    balances = {}
+    if changed_rows:
+        deltas = {
+            row["id"]: row["quantity_received"] - (items_by_id[row["id"]].quantity_received or 0)
+            for row in changed_rows
+            if "quantity_received" in row
+        }
+        db.execute(update(models.InwardItem), changed_rows)
+        if entry.status == "FINAL_APPROVED":
+            try:
+                balances = _post_quantity_corrections(db, entry, items_by_id, deltas, user_id)
+            except StockCorrectionError:
+                db.rollback()
+                raise
+            refresh_store_inventory(db, gate_entry_ids=[entry.id])
+            lots.sync_locations(db, changed_rows)
+            if balances:
+                bump_resource_version(db, MATERIALS_RESOURCE)
+        bump_resource_version(db, STORE_ITEMS_RESOURCE)
 
     db.commit()
+    for material_id, balance in balances.items():
+        events.notify("materials", "updated", material_id, roles=[UserRole.STORE_MANAGER, UserRole.OFFICER], current_stock=balance)
+    if balances:
+        low_stock_alerts.observe(db, balances)
     return entry
 
 def request_issue(db: Session, issue: schemas.MaterialIssueCreate, user_id: int):
@@ -272,83 +587,142 @@ def request_issue(db: Session, issue: schemas.MaterialIssueCreate, user_id: int)
     db.add(db_issue)
     db.commit()
     db.refresh(db_issue)
+    events.notify("pending-issues", "added", db_issue.id, users=[db_issue.officer_id], status=db_issue.status)
+    events.notify("issue-history", "added", db_issue.id, users=[user_id], status=db_issue.status)
     return db_issue
 
-def get_pending_issues(db: Session, officer_id: int):
-    from sqlalchemy.orm import joinedload
-    
-    # Explicitly query with joinedload to ensure material is loaded
-    results = db.query(models.MaterialIssue).options(
-        joinedload(models.MaterialIssue.material)
-    ).filter(
+# Issue listings serialise material and approver names: load both in the same query
+ISSUE_LISTING_OPTIONS = (
+    joinedload(models.MaterialIssue.material),
+    joinedload(models.MaterialIssue.approved_by),
+)
+
+def pending_issues_statement(officer_id: int):
+    return select(models.MaterialIssue).options(*ISSUE_LISTING_OPTIONS).where(
         models.MaterialIssue.officer_id == officer_id,
         models.MaterialIssue.status == "PENDING_OFFICER_APPROVAL"
-    ).all()
-    
-    # Force load the material relationship
-    for issue in results:
-        _ = issue.material  # Access the relationship to ensure it's loaded
-    
-    return results
-    
-def get_officer_approved_issues(db: Session, officer_id: int):
-    from sqlalchemy.orm import joinedload
-    
-    # Query executed and approved issues by this officer
-    issues = db.query(models.MaterialIssue).options(
-        joinedload(models.MaterialIssue.material)
-    ).filter(
+    )
+
+def get_pending_issues(db: Session, officer_id: int):
+    return db.scalars(pending_issues_statement(officer_id)).all()
+
+def approved_issues_statement(officer_id: int, cursor: Optional[str] = None, limit: Optional[int] = None):
+    # Executed and approved issues by this officer, newest approval first
+    statement = select(models.MaterialIssue).options(*ISSUE_LISTING_OPTIONS).where(
         models.MaterialIssue.officer_id == officer_id,
         models.MaterialIssue.status == "APPROVED"
-    ).order_by(models.MaterialIssue.approved_at.desc()).all()
-    
-    # Force load relationship
-    for issue in issues:
-        _ = issue.material
-        
-    return issues
+    )
+    return APPROVED_ISSUE_KEYSET.apply(statement, cursor, limit)
+
+def get_officer_approved_issues(db: Session, officer_id: int, cursor: Optional[str] = None, limit: Optional[int] = None):
+    return db.scalars(approved_issues_statement(officer_id, cursor, limit)).all()
+
+# Retries for transient lock errors ("database is locked", deadlock/serialization failures)
+ISSUE_APPROVAL_MAX_RETRIES = 3
+ISSUE_APPROVAL_RETRY_BACKOFF = 0.05  # seconds, doubled per attempt
 
 def approve_issue(db: Session, issue_id: int, officer_id: int):
+    """
+    Approve an issue and deduct stock without a read-modify-write race:
+    the issue is claimed with a status-guarded UPDATE and stock is decremented with
+    `current_stock = current_stock - q WHERE current_stock >= q`, so concurrent approvals
+    across workers can neither double-approve nor oversell. The quantity is drawn from
+    the material's lots in the same transaction (see backend/lots.py).
+    """
+    from sqlalchemy.exc import OperationalError
+
+    for attempt in range(ISSUE_APPROVAL_MAX_RETRIES + 1):
+        try:
+            return _approve_issue_once(db, issue_id, officer_id)
+        except OperationalError:
+            db.rollback()
+            if attempt == ISSUE_APPROVAL_MAX_RETRIES:
+                raise
+            time.sleep(ISSUE_APPROVAL_RETRY_BACKOFF * (2 ** attempt))
+
+def _approve_issue_once(db: Session, issue_id: int, officer_id: int):
+    from sqlalchemy import update
+
     issue = db.query(models.MaterialIssue).filter(models.MaterialIssue.id == issue_id).first()
     if not issue or issue.status != "PENDING_OFFICER_APPROVAL":
         return None
-        
-    material = db.query(models.Material).filter(models.Material.id == issue.material_id).first()
-    if not material:
-        return None # Error
-        
-    # Check Stock
-    if material.current_stock < issue.quantity_requested:
-         # In real app, might reject or partial approve. Here let's assume strict check.
-         # For MVP, we might want to return a specific error, but keeping it simple.
-         return None # Or raise specific error for low stock
-         
-    # Deduct Stock
-    material.current_stock -= issue.quantity_requested
+
+    material_id = issue.material_id
+    quantity = issue.quantity_requested
+
+    # Claim the issue; loses cleanly if another officer approved it meanwhile
+    claimed = db.execute(
+        update(models.MaterialIssue)
+        .where(models.MaterialIssue.id == issue_id, models.MaterialIssue.status == "PENDING_OFFICER_APPROVAL")
+        .values(
+            status="APPROVED",
+            approved_by_id=officer_id,
+            approved_at=datetime.datetime.now(),
+            issue_note_id=f"NOTE-{uuid.uuid4().hex[:8].upper()}"
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if claimed.rowcount != 1:
+        db.rollback()
+        return None
+
+    # Check & Deduct Stock atomically.
+    # In real app, might reject or partial approve. Here let's assume strict check.
+    stock_update = (
+        update(models.Material)
+        .where(models.Material.id == material_id, models.Material.current_stock >= quantity)
+        .values(current_stock=models.Material.current_stock - quantity)
+        .execution_options(synchronize_session=False)
+    )
+    if db.get_bind().dialect.update_returning:
+        balance_after = db.execute(stock_update.returning(models.Material.current_stock)).scalar()
+    else:
+        result = db.execute(stock_update)
+        balance_after = None
+        if result.rowcount == 1:
+            balance_after = db.query(models.Material.current_stock).filter(models.Material.id == material_id).scalar()
+    if balance_after is None:
+        db.rollback()
+        return None # Material missing or low stock
     
     # Create Log
     log = models.InventoryLog(
-        material_id=material.id,
-        change_quantity=-issue.quantity_requested,
-        balance_after=material.current_stock,
+        material_id=material_id,
+        change_quantity=-quantity,
+        balance_after=balance_after,
         transaction_type="ISSUE",
-        reference_id=f"ISS-{issue.id}",
+        reference_id=f"ISS-{issue_id}",
         created_by_id=officer_id
     )
     db.add(log)
-    
-    # Update Issue
-    issue.status = "APPROVED"
-    issue.approved_by_id = officer_id
-    issue.approved_at = datetime.datetime.now()
-    issue.issue_note_id = f"NOTE-{uuid.uuid4().hex[:8].upper()}"
+    lots.allocate(db, issue_id, material_id, quantity)
+    bump_resource_version(db, MATERIALS_RESOURCE)
     
     db.commit()
     db.refresh(issue)
+    events.notify("pending-issues", "removed", issue.id, users=[issue.officer_id], status=issue.status)
+    events.notify("approved-issues", "added", issue.id, users=[issue.officer_id], status=issue.status)
+    events.notify("issue-history", "updated", issue.id, users=[issue.requested_by_id], status=issue.status)
+    events.notify("materials", "updated", material_id, roles=[UserRole.STORE_MANAGER, UserRole.OFFICER], current_stock=balance_after)
+    low_stock_alerts.observe(db, {material_id: balance_after})
     return issue
 
-def get_materials(db: Session):
-    return db.query(models.Material).all()
+def materials_statement(cursor: Optional[str] = None, limit: Optional[int] = None,
+                        search: Optional[str] = None, category: Optional[str] = None):
+    statement = select(models.Material)
+    if search:
+        # Catalog search box: code or name contains the text, case-insensitively
+        statement = statement.where(
+            models.Material.code.icontains(search, autoescape=True)
+            | models.Material.name.icontains(search, autoescape=True)
+        )
+    if category:
+        statement = statement.where(models.Material.category == category)
+    return MATERIAL_KEYSET.apply(statement, cursor, limit)
+
+def get_materials(db: Session, cursor: Optional[str] = None, limit: Optional[int] = None,
+                  search: Optional[str] = None, category: Optional[str] = None):
+    return db.scalars(materials_statement(cursor, limit, search, category)).all()
 
 def create_material(db: Session, material: schemas.MaterialCreate):
     db_material = models.Material(
@@ -361,140 +735,271 @@ def create_material(db: Session, material: schemas.MaterialCreate):
         current_stock=0
     )
     db.add(db_material)
+    bump_resource_version(db, MATERIALS_RESOURCE)
     db.commit()
     db.refresh(db_material)
+    material_cache.invalidate([db_material.id])
+    low_stock_alerts.recheck(db, [db_material.id])
     return db_material
 
 # --- Store View Logic ---
-def get_store_items(db: Session, user: models.User):
+
+STORE_INVENTORY_MARKER_KEY = "store_inventory_built"
+STORE_INVENTORY_REBUILD_BATCH = 1000
+
+def _store_inventory_rows(db: Session, *filters):
     """
-    Get inventory items with role-based visibility.
-    - Officer: Only items where they were the requesting officer.
-    - Store Manager: All items, showing the requesting officer's name.
-    
-    Only shows items from FINAL_APPROVED gate entries.
+    Build StoreInventory rows from the source tables for FINAL_APPROVED entries.
+    Join InwardItem -> InwardProcess -> GateEntry, plus the Officer (User) for the name and
+    the Material master. The master is read from the database, not the material cache: this
+    runs inside write transactions and must never cache uncommitted master values.
     """
-    
-    # Base Query: Join InwardItem -> InwardProcess -> GateEntry -> Material (LEFT JOIN)
-    # Also join Officer (User) via GateEntry.request_officer_id to get officer name
-    
     query = db.query(
         models.InwardItem,
-        models.Material,
+        models.GateEntry.id.label("gate_entry_id"),
+        models.GateEntry.request_officer_id,
         models.User.username.label("officer_username"),
         models.InwardProcess.invoice_date.label("inward_date"),
-        models.GateEntry.status
+        models.Material.name.label("master_name"),
+        models.Material.code.label("master_code"),
+        models.Material.category.label("master_category"),
+        models.Material.unit.label("master_unit"),
     ).join(
         models.InwardProcess, models.InwardItem.inward_process_id == models.InwardProcess.id
     ).join(
         models.GateEntry, models.InwardProcess.gate_entry_id == models.GateEntry.id
-    ).outerjoin( # LEFT JOIN for Material - may be NULL
-        models.Material, models.InwardItem.material_id == models.Material.id
     ).outerjoin( # Outer join in case officer is missing (unlikely but safe)
         models.User, models.GateEntry.request_officer_id == models.User.id
+    ).outerjoin(
+        models.Material, models.InwardItem.material_id == models.Material.id
+    ).filter(
+        # CRITICAL: Only show items from FINAL_APPROVED entries
+        models.GateEntry.status == "FINAL_APPROVED",
+        *filters
     )
-    
-    # CRITICAL: Only show items from FINAL_APPROVED entries
-    query = query.filter(models.GateEntry.status == "FINAL_APPROVED")
-    
-    # Filter by Role
-    if user.role == models.UserRole.OFFICER:
-        query = query.filter(models.GateEntry.request_officer_id == user.id)
-    
-    # Execute
-    results = query.all()
-    
-    # Transform to Schema
-    response = []
-    for item, material, officer_name, inward_date, gate_status in results:
+    rows = []
+    for item, gate_entry_id, officer_id, officer_name, inward_date, *master in query.all():
         # Use Material Master data if available, otherwise use InwardItem columns
-        if material:
-            material_name = material.name
-            material_code = material.code
-            category = material.category
-            unit = material.unit
+        if master[1] is not None:
+            material_name, material_code, category, unit = master
         else:
             # Fallback to InwardItem data when no Material Master link
             material_name = item.material_description or "Unknown"
             material_code = "N/A"
             category = item.material_category or "CONSUMABLE"
             unit = item.material_unit or "Nos"
-        
-        response.append(schemas.StoreItemResponse(
-            id=item.id,
-            material_name=material_name,
-            material_code=material_code,
-            category=category,
-            quantity=item.quantity_received,
-            unit=unit,
-            store_room=item.store_room,
-            rack_no=item.rack_no,
-            shelf_no=item.shelf_no,
-            inward_date=inward_date,
-            officer_name=officer_name if user.role == models.UserRole.STORE_MANAGER else None
-        ))
-        
-    return response
 
-def get_issue_history(db: Session, user_id: int):
-    """Get all material issues created by the store manager"""
-    from sqlalchemy.orm import joinedload
-    
-    # Get all issues created by this user
-    issues = db.query(models.MaterialIssue).options(
-        joinedload(models.MaterialIssue.material)
-    ).filter(
-        models.MaterialIssue.requested_by_id == user_id
-    ).order_by(models.MaterialIssue.id.desc()).all()
-    
-    # Force load material and get approver info
-    for issue in issues:
-        _ = issue.material
-        
-    return issues
+        rows.append({
+            "id": item.id,
+            "gate_entry_id": gate_entry_id,
+            "officer_id": officer_id,
+            "officer_name": officer_name,
+            "material_id": item.material_id,
+            "material_name": material_name,
+            "material_code": material_code,
+            "category": category,
+            "quantity": item.quantity_received,
+            "unit": unit,
+            "store_room": item.store_room,
+            "rack_no": item.rack_no,
+            "shelf_no": item.shelf_no,
+            "inward_date": inward_date,
+        })
+    return rows
+
+def refresh_store_inventory(db: Session, gate_entry_ids=(), material_ids=()):
+    """
+    Re-project the store inventory rows of the given gate entries and/or materials.
+    Runs inside the caller's transaction; cost is proportional to the rows touched.
+    """
+    from sqlalchemy import delete, insert, or_
+
+    gate_entry_ids = set(gate_entry_ids)
+    material_ids = set(material_ids)
+    if not gate_entry_ids and not material_ids:
+        return
+
+    projection = models.StoreInventory
+    stale, source = [], []
+    if gate_entry_ids:
+        stale.append(projection.gate_entry_id.in_(gate_entry_ids))
+        source.append(models.GateEntry.id.in_(gate_entry_ids))
+    if material_ids:
+        stale.append(projection.material_id.in_(material_ids))
+        source.append(models.InwardItem.material_id.in_(material_ids))
+
+    db.execute(delete(projection).where(or_(*stale)))
+    rows = _store_inventory_rows(db, or_(*source))
+    if rows:
+        db.execute(insert(projection), rows)
+
+def rebuild_store_inventory(db: Session):
+    """Regenerate the whole store inventory projection from the source tables"""
+    from sqlalchemy import delete, insert
+
+    db.execute(delete(models.StoreInventory))
+    entry_ids = [entry_id for (entry_id,) in db.query(GateEntry.id).filter(
+        GateEntry.status == "FINAL_APPROVED"
+    ).order_by(GateEntry.id)]
+    total = 0
+    for i in range(0, len(entry_ids), STORE_INVENTORY_REBUILD_BATCH):
+        rows = _store_inventory_rows(db, GateEntry.id.in_(entry_ids[i:i + STORE_INVENTORY_REBUILD_BATCH]))
+        if rows:
+            db.execute(insert(models.StoreInventory), rows)
+        total += len(rows)
+
+    marker = db.get(models.AppMetadata, STORE_INVENTORY_MARKER_KEY)
+    if marker:
+        marker.value = str(total)
+    else:
+        db.add(models.AppMetadata(key=STORE_INVENTORY_MARKER_KEY, value=str(total)))
+    bump_resource_version(db, STORE_ITEMS_RESOURCE)
+    db.commit()
+    return total
 
-def generate_issue_receipt(db: Session, issue_id: int):
-    """Generate receipt text for an approved issue"""
-    from sqlalchemy.orm import joinedload
-    
-    issue = db.query(models.MaterialIssue).options(
-        joinedload(models.MaterialIssue.material)
-    ).filter(models.MaterialIssue.id == issue_id).first()
+def ensure_store_inventory(db: Session):
+    """Build the projection once on databases that predate it"""
+    if db.get(models.AppMetadata, STORE_INVENTORY_MARKER_KEY) is None:
+        rebuild_store_inventory(db)
+
+def store_items_statement(user: models.User, cursor: Optional[str] = None, limit: Optional[int] = None,
+                          officer_id: Optional[int] = None):
+    statement = select(models.StoreInventory)
     
-    if not issue or issue.status != "APPROVED":
-        return None
-        
-    # Get approver info
-    approver = db.query(models.User).filter(models.User.id == issue.approved_by_id).first()
-    approver_name = approver.username if approver else "Unknown"
+    # Filter by Role
+    if user.role == models.UserRole.OFFICER:
+        statement = statement.where(models.StoreInventory.officer_id == user.id)
+    elif officer_id is not None:
+        statement = statement.where(models.StoreInventory.officer_id == officer_id)
+    return STORE_ITEM_KEYSET.apply(statement, cursor, limit)
+
+def get_store_items(db: Session, user: models.User, cursor: Optional[str] = None, limit: Optional[int] = None,
+                    officer_id: Optional[int] = None):
+    """
+    Get inventory items with role-based visibility.
+    - Officer: Only items where they were the requesting officer.
+    - Store Manager: All items (optionally one officer's), showing the requesting officer's name.
     
-    # Generate receipt text
-    receipt = f"""
+    Only shows items from FINAL_APPROVED gate entries (served from the store_inventory projection).
+    """
+    results = db.scalars(store_items_statement(user, cursor, limit, officer_id)).all()
+    return store_item_responses(user, results)
+
+def store_item_responses(user: models.User, results) -> list:
+    # Transform to Schema
+    show_officer = user.role == models.UserRole.STORE_MANAGER
+    return [
+        schemas.StoreItemResponse(
+            id=row.id,
+            material_name=row.material_name,
+            material_code=row.material_code,
+            category=row.category,
+            quantity=row.quantity,
+            unit=row.unit,
+            store_room=row.store_room,
+            rack_no=row.rack_no,
+            shelf_no=row.shelf_no,
+            inward_date=row.inward_date,
+            officer_name=row.officer_name if show_officer else None
+        )
+        for row in results
+    ]
+
+def issue_history_statement(user_id: int, cursor: Optional[str] = None, limit: Optional[int] = None):
+    # All issues created by this user, newest first (approver joined for approver_name)
+    statement = select(models.MaterialIssue).options(*ISSUE_LISTING_OPTIONS).where(
+        models.MaterialIssue.requested_by_id == user_id
+    )
+    return ISSUE_HISTORY_KEYSET.apply(statement, cursor, limit)
+
+def get_issue_history(db: Session, user_id: int, cursor: Optional[str] = None, limit: Optional[int] = None):
+    """Get all material issues created by the store manager"""
+    return db.scalars(issue_history_statement(user_id, cursor, limit)).all()
+
+ISSUE_RECEIPT_TEMPLATE = """
 ================================================================================
                         MATERIAL ISSUE APPROVAL RECEIPT
 ================================================================================
 
-Issue ID:           {issue.issue_note_id or f'ISS-{issue.id}'}
-Date & Time:        {issue.approved_at.strftime('%d-%m-%Y %I:%M %p') if issue.approved_at else 'N/A'}
+Issue ID:           {issue_id}
+Date & Time:        {approved_at}
 
 MATERIAL DETAILS
 --------------------------------------------------------------------------------
-Material Name:      {issue.material.name if issue.material else 'Unknown'}
-Material Code:      {issue.material.code if issue.material else 'N/A'}
-Quantity Issued:    {issue.quantity_requested} {issue.material.unit if issue.material else ''}
+Material Name:      {material_name}
+Material Code:      {material_code}
+Quantity Issued:    {quantity} {unit}
 
 REQUEST DETAILS
 --------------------------------------------------------------------------------
-Purpose:            {issue.purpose}
-Requesting Dept:    {issue.requesting_dept}
+Purpose:            {purpose}
+Requesting Dept:    {requesting_dept}
 
 APPROVAL DETAILS
 --------------------------------------------------------------------------------
 Approved By:        {approver_name}
-Status:             {issue.status}
+Status:             {status}
 
 ================================================================================
                     This is a system-generated document
 ================================================================================
-"""
-    return receipt
+""".format
+
+def render_issue_receipt(issue: models.MaterialIssue, material, approver_name: Optional[str]) -> str:
+    """Fill the receipt template; shared by the single and batch receipt paths"""
+    return ISSUE_RECEIPT_TEMPLATE(
+        issue_id=issue.issue_note_id or f'ISS-{issue.id}',
+        approved_at=issue.approved_at.strftime('%d-%m-%Y %I:%M %p') if issue.approved_at else 'N/A',
+        material_name=material.name if material else 'Unknown',
+        material_code=material.code if material else 'N/A',
+        quantity=issue.quantity_requested,
+        unit=material.unit if material else '',
+        purpose=issue.purpose,
+        requesting_dept=issue.requesting_dept,
+        approver_name=approver_name or "Unknown",
+        status=issue.status,
+    )
+
+def generate_issue_receipt(db: Session, issue_id: int):
+    """Generate receipt text for an approved issue"""
+    issue = db.query(models.MaterialIssue).filter(models.MaterialIssue.id == issue_id).first()
+    
+    if not issue or issue.status != "APPROVED":
+        return None
+
+    material = material_cache.get(db, issue.material_id)
+        
+    # Get approver info
+    approver_name = resolve_usernames(db, [issue.approved_by_id]).get(issue.approved_by_id, "Unknown")
+    
+    return render_issue_receipt(issue, material, approver_name)
+
+RECEIPT_BATCH_SIZE = 500
+
+def iter_issue_receipts(db: Session, issue_ids: Optional[list] = None, date_from: Optional[datetime.datetime] = None,
+                        date_to: Optional[datetime.datetime] = None):
+    """
+    Yield (issue, receipt_text) for approved issues, selected by id list and/or approval
+    date range [date_from, date_to). Works in batches: one issue query plus, for cache
+    misses only, one approver and one material query per RECEIPT_BATCH_SIZE issues.
+    """
+    query = db.query(models.MaterialIssue).filter(models.MaterialIssue.status == "APPROVED")
+    if issue_ids is not None:
+        query = query.filter(models.MaterialIssue.id.in_(issue_ids))
+    if date_from is not None:
+        query = query.filter(models.MaterialIssue.approved_at >= date_from)
+    if date_to is not None:
+        query = query.filter(models.MaterialIssue.approved_at < date_to)
+    query = query.order_by(models.MaterialIssue.id)
+
+    last_id = 0
+    while True:
+        batch = query.filter(models.MaterialIssue.id > last_id).limit(RECEIPT_BATCH_SIZE).all()
+        if not batch:
+            return
+        materials = material_cache.get_many(db, (issue.material_id for issue in batch))
+        approvers = resolve_usernames(db, (issue.approved_by_id for issue in batch))
+        for issue in batch:
+            yield issue, render_issue_receipt(issue, materials.get(issue.material_id), approvers.get(issue.approved_by_id))
+        last_id = batch[-1].id
+        db.expunge_all()
@@ -1,15 +1,65 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 import os
 
+from backend.instrumentation import instrument_engine
+
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./store.db")
 
-connect_args = {"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+# --- Engine profiles (all tunable via environment) ---
+
+# SQLite: WAL lets readers run alongside the single writer; busy_timeout makes
+# writers wait for the lock instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),  # negative = KiB
+}
+
+# Server databases (Postgres etc.): QueuePool sizing per worker process
+POOL_SETTINGS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "30")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+}
+
+def _apply_sqlite_pragmas(engine, url: str):
+    in_memory = ":memory:" in url or url.split("?")[0].rstrip("/").endswith(":")
 
-engine = create_engine(
-    DATABASE_URL, connect_args=connect_args
-)
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in SQLITE_PRAGMAS.items():
+            if pragma == "journal_mode" and in_memory:
+                continue  # WAL is not available for in-memory databases
+            cursor.execute(f"PRAGMA {pragma}={value}")
+        cursor.close()
+
+def _build_engine(url: str):
+    if url.startswith("sqlite"):
+        engine = create_engine(
+            url,
+            connect_args={
+                "check_same_thread": False,
+                "timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000,
+            },
+        )
+        _apply_sqlite_pragmas(engine, url)
+        return engine
+
+    return create_engine(url, **POOL_SETTINGS)
+
+engine = _build_engine(DATABASE_URL)
+# Per-request statement counts, DB time and slow-query logging (see backend/instrumentation.py)
+instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -20,3 +70,53 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# --- Optional async engine for the read-heavy endpoints ---
+# ASYNC_DB=1 serves the list endpoints from `async def` handlers on an AsyncSession,
+# so their concurrency is bounded by the connection pool instead of the threadpool.
+# Needs the driver for the database: `aiosqlite` (SQLite) or `asyncpg` (Postgres).
+ASYNC_DB = _env_bool("ASYNC_DB", False)
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def async_database_url(url: str) -> str:
+    """Same database, async driver (ASYNC_DATABASE_URL overrides)"""
+    explicit = os.getenv("ASYNC_DATABASE_URL")
+    if explicit:
+        return explicit
+    scheme, rest = url.split("://", 1)
+    backend = scheme.split("+")[0]
+    if backend == "postgres":
+        backend = "postgresql"
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f"ASYNC_DB is not supported for {backend!r}; set ASYNC_DATABASE_URL")
+    return f"{ASYNC_DRIVERS[backend]}://{rest}"
+
+def _build_async_engine(url: str):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    try:
+        if url.startswith("sqlite"):
+            engine = create_async_engine(url, connect_args={"timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000})
+            _apply_sqlite_pragmas(engine.sync_engine, url)
+            return engine
+        return create_async_engine(url, **POOL_SETTINGS)
+    except ImportError as exc:
+        raise RuntimeError(f"ASYNC_DB is enabled but the async driver is not installed ({exc.name})") from exc
+
+async_engine = None
+AsyncSessionLocal = None
+if ASYNC_DB:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    async_engine = _build_async_engine(async_database_url(DATABASE_URL))
+    instrument_engine(async_engine.sync_engine)
+    # No lazy loading on AsyncSession: read paths eager-load what they serialise
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
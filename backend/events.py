@@ -0,0 +1,159 @@
+"""
+Workflow queue change events, pushed to dashboards over Server-Sent Events.
+
+crud write paths call `notify()` after committing. Each event is addressed to topics
+("user:<id>", "role:<ROLE>"); every open /events/stream connection subscribes to its
+user's and role's topics (admins see everything) and receives only matching events.
+
+Fan-out to subscribers happens in-process. The backend decides how an event reaches
+every worker: InProcessBackend (default) delivers locally only; RedisBackend
+(EVENT_BROKER_URL=redis://...) publishes to a Redis channel that every worker listens on.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = 256
+ALL_TOPICS = "*"
+
+
+class Subscription:
+    def __init__(self, topics: set, loop: asyncio.AbstractEventLoop):
+        self.topics = topics
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        # Set when events had to be dropped; the client should refetch its queues
+        self.overflowed = False
+
+    def wants(self, topics) -> bool:
+        return ALL_TOPICS in self.topics or not self.topics.isdisjoint(topics)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class EventBroker:
+    """In-process fan-out of events to the SSE subscriptions of this worker."""
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self.backend = None
+
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        subscription = Subscription(set(topics), asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def deliver(self, event: dict):
+        """Hand an event to every local subscription interested in its topics (thread-safe)"""
+        topics = event.get("topics", ())
+        with self._lock:
+            targets = [sub for sub in self._subscriptions if sub.wants(topics)]
+        for sub in targets:
+            try:
+                sub.loop.call_soon_threadsafe(sub._put, event)
+            except RuntimeError:
+                # Event loop already closed; the stream is gone
+                self.unsubscribe(sub)
+
+    def publish(self, event: dict):
+        self.backend.publish(event)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscriptions)
+
+
+class InProcessBackend:
+    """Single-worker backend: events only reach subscribers of the publishing process."""
+
+    def __init__(self, broker: EventBroker):
+        self.broker = broker
+
+    def publish(self, event: dict):
+        self.broker.deliver(event)
+
+    def close(self):
+        pass
+
+
+class RedisBackend:
+    """
+    Multi-worker backend over Redis pub/sub. Every worker runs a listener thread and
+    delivers what it hears locally, including its own events.
+    Requires the optional `redis` package.
+    """
+
+    CHANNEL = "store-management:events"
+
+    def __init__(self, broker: EventBroker, url: str):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("EVENT_BROKER_URL points at Redis but the 'redis' package is not installed")
+        self.broker = broker
+        self._client = redis.Redis.from_url(url)
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{self.CHANNEL: self._on_message})
+        self._thread = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def _on_message(self, message):
+        try:
+            self.broker.deliver(json.loads(message["data"]))
+        except (ValueError, KeyError):
+            logger.warning("Ignoring malformed event from Redis")
+
+    def publish(self, event: dict):
+        self._client.publish(self.CHANNEL, json.dumps(event, default=str))
+
+    def close(self):
+        self._thread.stop()
+        self._pubsub.close()
+
+
+def _build_backend(broker: EventBroker):
+    url = os.getenv("EVENT_BROKER_URL", "")
+    if url.startswith(("redis://", "rediss://")):
+        return RedisBackend(broker, url)
+    return InProcessBackend(broker)
+
+
+broker = EventBroker()
+broker.backend = _build_backend(broker)
+
+
+def topics_for_user(user) -> set:
+    """Topics an authenticated user's stream subscribes to"""
+    role = getattr(user.role, "value", user.role)
+    if role == "ADMIN":
+        return {ALL_TOPICS}
+    return {f"user:{user.id}", f"role:{role}"}
+
+
+def notify(queue: str, action: str, object_id: int, users: Iterable[Optional[int]] = (),
+           roles: Iterable[str] = (), **data):
+    """
+    Announce that `object_id` was added to / removed from / updated in `queue`.
+    Called by crud after commit; failures are logged and never break the request.
+    """
+    topics = [f"user:{user_id}" for user_id in users if user_id is not None]
+    topics += [f"role:{getattr(role, 'value', role)}" for role in roles]
+    event = {"queue": queue, "action": action, "id": object_id, "topics": topics, **data}
+    try:
+        broker.publish(event)
+    except Exception:
+        logger.exception("Failed to publish %s event for %s", queue, object_id)
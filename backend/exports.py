@@ -0,0 +1,163 @@
+"""
+Streaming exports (CSV / NDJSON, optionally gzipped; zip archives of documents) for audits.
+
+Rows are fetched in partitions with yield_per, which uses server-side cursors on
+dialects that support them (e.g. psycopg2), and encoded chunk by chunk, so memory
+stays flat however many rows are exported. Each stream opens its own session because
+it outlives the request that started it.
+"""
+import csv
+import io
+import json
+import zipfile
+import zlib
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from backend import models
+from backend.database import SessionLocal
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _in_range(column, date_from: Optional[datetime], date_to: Optional[datetime]):
+    clauses = []
+    if date_from is not None:
+        clauses.append(column >= date_from)
+    if date_to is not None:
+        clauses.append(column < date_to)
+    return clauses
+
+
+def store_items_statement(officer_id: Optional[int] = None, date_from=None, date_to=None):
+    inv = models.StoreInventory
+    stmt = select(
+        inv.id, inv.material_code, inv.material_name, inv.category, inv.quantity, inv.unit,
+        inv.store_room, inv.rack_no, inv.shelf_no, inv.inward_date, inv.officer_id, inv.officer_name,
+        inv.gate_entry_id,
+    ).where(*_in_range(inv.inward_date, date_from, date_to)).order_by(inv.id)
+    if officer_id is not None:
+        stmt = stmt.where(inv.officer_id == officer_id)
+    return stmt
+
+
+def issue_history_statement(requested_by_id: Optional[int] = None, officer_id: Optional[int] = None,
+                            date_from=None, date_to=None):
+    issue = models.MaterialIssue
+    approver = aliased(models.User)
+    stmt = select(
+        issue.id, issue.issue_note_id, issue.created_at, issue.status,
+        issue.material_id, models.Material.code.label("material_code"), models.Material.name.label("material_name"),
+        issue.quantity_requested, models.Material.unit.label("unit"), issue.purpose, issue.requesting_dept,
+        issue.requested_by_id, issue.officer_id, issue.approved_by_id, approver.username.label("approver_name"),
+        issue.approved_at,
+    ).outerjoin(
+        models.Material, issue.material_id == models.Material.id
+    ).outerjoin(
+        approver, issue.approved_by_id == approver.id
+    ).where(*_in_range(issue.created_at, date_from, date_to)).order_by(issue.id)
+    if requested_by_id is not None:
+        stmt = stmt.where(issue.requested_by_id == requested_by_id)
+    if officer_id is not None:
+        stmt = stmt.where(issue.officer_id == officer_id)
+    return stmt
+
+
+def inventory_logs_statement(officer_id: Optional[int] = None, material_id: Optional[int] = None,
+                             date_from=None, date_to=None):
+    log = models.InventoryLog
+    stmt = select(
+        log.id, log.created_at, log.material_id, log.transaction_type, log.change_quantity,
+        log.balance_after, log.reference_id, log.created_by_id,
+    ).where(*_in_range(log.created_at, date_from, date_to)).order_by(log.id)
+    if officer_id is not None:
+        stmt = stmt.where(log.created_by_id == officer_id)
+    if material_id is not None:
+        stmt = stmt.where(log.material_id == material_id)
+    return stmt
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _encode_batches(statement, fmt: str):
+    """Yield encoded text chunks, one per fetched partition"""
+    db = SessionLocal()
+    try:
+        result = db.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        columns = list(result.keys())
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            for partition in result.partitions():
+                writer.writerows([[_encode_value(v) for v in row] for row in partition])
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            yield buffer.getvalue()
+        else:
+            for partition in result.partitions():
+                yield "".join(
+                    json.dumps(dict(zip(columns, map(_encode_value, row))), default=str) + "\n"
+                    for row in partition
+                )
+    finally:
+        db.close()
+
+
+def stream_export(statement, fmt: str = "csv", gzip: bool = False):
+    """Byte chunks of the export; gzip output is a standard .gz stream"""
+    if not gzip:
+        for chunk in _encode_batches(statement, fmt):
+            if chunk:
+                yield chunk.encode()
+        return
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in _encode_batches(statement, fmt):
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class _ZipSink:
+    """Write-only file object; zipfile falls back to streaming mode (data descriptors)"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(files):
+    """Zip (filename, text) pairs into a byte stream without building the archive in memory"""
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for filename, text in files:
+            archive.writestr(filename, text)
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
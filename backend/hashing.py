@@ -0,0 +1,111 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from passlib.context import CryptContext
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Workers must not be forked from a server process that already runs threads and holds
+# pooled DB / Redis sockets; forkserver (or spawn where unavailable) starts them clean
+POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+def hash_password(password):
+    return pwd_context.hash(password)
+
+def check_password(plain_password, hashed_password):
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+class PasswordHasherPool:
+    """
+    Runs bcrypt hash/verify in a dedicated process pool so logins use every core
+    and never hold a slot in the request threadpool while hashing.
+    `max_workers` is the concurrency cap. 0 disables the process pool (useful for
+    scripts/tests): verify/hash then run on the event loop's default thread executor and
+    hash_many hashes inline, so there is no queue of our own to report.
+    The app calls start() from its startup hook; scripts get the pool on first use.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._calls = 0
+        self._total_seconds = 0.0
+        self._max_seconds = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers, mp_context=multiprocessing.get_context(POOL_START_METHOD)
+                    )
+        return self._executor
+
+    def start(self):
+        """Create the pool and launch its workers now rather than on the first login"""
+        if self.max_workers > 0:
+            self._get_executor().submit(int)
+
+    def _record(self, started):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._pending -= 1
+            self._calls += 1
+            self._total_seconds += elapsed
+            self._max_seconds = max(self._max_seconds, elapsed)
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            self._pending += 1
+        started = time.perf_counter()
+        try:
+            if self.max_workers <= 0:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(None, fn, *args)
+            future = self._get_executor().submit(fn, *args)
+            return await asyncio.wrap_future(future)
+        finally:
+            self._record(started)
+
+    async def verify(self, plain_password, hashed_password):
+        return await self._run(check_password, plain_password, hashed_password)
+
+    async def hash(self, password):
+        return await self._run(hash_password, password)
+
+    def hash_many(self, passwords):
+        """Hash several passwords in parallel from synchronous code (e.g. seeding)"""
+        passwords = list(passwords)
+        if self.max_workers <= 0 or len(passwords) < 2:
+            return [hash_password(p) for p in passwords]
+        return list(self._get_executor().map(hash_password, passwords))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "pending": self._pending,
+                # Without a pool, waiting work sits in the loop's shared default executor
+                "queue_depth": max(0, self._pending - self.max_workers) if self.max_workers > 0 else None,
+                "calls": self._calls,
+                "avg_latency_ms": round(self._total_seconds / self._calls * 1000, 2) if self._calls else 0.0,
+                "max_latency_ms": round(self._max_seconds * 1000, 2),
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_pool = PasswordHasherPool(
+    max_workers=int(os.getenv("BCRYPT_WORKERS", str(min(os.cpu_count() or 1, 4))))
+)
@@ -0,0 +1,89 @@
+"""
+Liveness / readiness probes.
+
+- live: the process is serving requests; no database access.
+- ready: the database answers `SELECT 1` within HEALTH_CHECK_TIMEOUT_SECONDS. The result
+  is cached for HEALTH_READY_CACHE_SECONDS and concurrent probes share one in-flight
+  check, so a load balancer probing every few seconds costs at most one round trip per
+  interval and a hung database cannot pile up threads.
+"""
+import asyncio
+import os
+import time
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+
+HEALTH_READY_CACHE_SECONDS = float(os.getenv("HEALTH_READY_CACHE_SECONDS", "5"))
+HEALTH_CHECK_TIMEOUT_SECONDS = float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", "2"))
+
+
+def pool_stats(engine) -> dict:
+    """Connection pool occupancy (QueuePool counters where the pool keeps them)"""
+    pool = engine.pool
+    stats = {"class": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        counter = getattr(pool, name, None)
+        if callable(counter):
+            stats[name] = counter()
+    return stats
+
+
+def _select_one(engine):
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+
+class ReadinessCheck:
+    def __init__(self, engine, cache_seconds: float = 5.0, timeout_seconds: float = 2.0):
+        self.engine = engine
+        self.cache_seconds = cache_seconds
+        self.timeout_seconds = timeout_seconds
+        self._result = None
+        self._checked_at = None
+        self._pending = None
+        self._straggler = None  # a timed-out SELECT 1 still holding a worker thread
+
+    async def _probe(self) -> dict:
+        started = time.perf_counter()
+        if self._straggler is not None and not self._straggler.done():
+            return {"status": "unavailable", "database": "previous check still waiting", "check_ms": 0.0}
+        probe = asyncio.ensure_future(run_in_threadpool(_select_one, self.engine))
+        try:
+            await asyncio.wait_for(asyncio.shield(probe), self.timeout_seconds)
+            result = {"status": "ready", "database": "connected"}
+        except asyncio.TimeoutError:
+            self._straggler = probe
+            probe.add_done_callback(lambda task: task.cancelled() or task.exception())
+            result = {"status": "unavailable", "database": f"no response within {self.timeout_seconds:g}s"}
+        except Exception as exc:
+            result = {"status": "unavailable", "database": f"error: {type(exc).__name__}"}
+        result["check_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    async def _refresh(self):
+        try:
+            result = await self._probe()
+            self._result = result
+            self._checked_at = time.monotonic()
+        finally:
+            self._pending = None
+
+    async def check(self) -> dict:
+        """Cached readiness result plus current pool stats"""
+        checked_at = self._checked_at
+        if checked_at is None or time.monotonic() - checked_at >= self.cache_seconds:
+            if self._pending is None:
+                self._pending = asyncio.ensure_future(self._refresh())
+            await asyncio.shield(self._pending)
+        return {
+            **self._result,
+            "checked_age_s": round(time.monotonic() - self._checked_at, 1),
+            "pool": pool_stats(self.engine),
+        }
+
+
+def build_readiness(engine) -> ReadinessCheck:
+    return ReadinessCheck(
+        engine, cache_seconds=HEALTH_READY_CACHE_SECONDS, timeout_seconds=HEALTH_CHECK_TIMEOUT_SECONDS
+    )
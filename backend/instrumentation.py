@@ -0,0 +1,320 @@
+"""
+Per-request database instrumentation: statement counts, database time and rows.
+
+SQLAlchemy cursor events (registered on the engines in backend/database.py) add every
+statement to the stats of the request currently being served, which QueryMetricsMiddleware
+keeps in a context variable. When the request finishes its totals are folded into
+per-route aggregates, rendered for Prometheus at /metrics, and the request's own totals
+are sent back in a `Server-Timing: db;dur=...;desc="N queries"` entry.
+
+Statements slower than SLOW_QUERY_MS are logged with the backend function that issued
+them (e.g. backend.crud.final_approve_gate_entry), which is usually enough to find the
+N+1 loop. `query_budget()` turns a query count into a test assertion.
+
+Rows are the rows affected by INSERT / UPDATE / DELETE. Rows fetched by SELECTs are not
+counted: SQLAlchemy has no public hook on result consumption, and statement counts and
+DB time already expose N+1 reads.
+
+/metrics is admin-only; a Prometheus scraper can use METRICS_TOKEN as its bearer token.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+SLOW_QUERY_SQL_CHARS = 500
+
+# Upper bounds of the statements-per-request histogram; a route creeping up the buckets is an N+1
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+UNMATCHED_ROUTE = "(unmatched)"
+BACKGROUND_ROUTE = "(background)"
+
+# Frames from these modules are plumbing, not the caller worth reporting
+_OWN_MODULES = ("backend.instrumentation", "backend.database")
+
+
+class RequestStats:
+    __slots__ = ("statements", "db_seconds", "rows", "slow")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.slow = 0
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_db_stats", default=None)
+
+# Open query_budget() blocks; each collects the SQL of every statement run while it is open
+_captures = []
+_captures_lock = threading.Lock()
+
+
+def current_stats() -> Optional[RequestStats]:
+    return _current.get()
+
+
+@contextmanager
+def track():
+    """Collect the statements run in this context (and threads / tasks spawned from it)"""
+    stats = RequestStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def _caller() -> str:
+    """The innermost backend function (outside this plumbing) on the stack"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("backend.") and module not in _OWN_MODULES:
+            return f"{module}.{frame.f_code.co_name}:{frame.f_lineno}"
+        frame = frame.f_back
+    return "unknown"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # On the statement's own execution context, so a statement that fails cannot leave
+    # its start time behind for the next one on this connection
+    if context is not None:
+        context._query_started = time.perf_counter()
+    else:
+        conn.info["query_started"] = time.perf_counter()
+
+
+def _pop_started(conn, context) -> Optional[float]:
+    if context is not None:
+        return context.__dict__.pop("_query_started", None)
+    return conn.info.pop("query_started", None)
+
+
+def _record(statement, elapsed, rows):
+    stats = _current.get()
+
+    slow = elapsed * 1000 >= SLOW_QUERY_MS
+    if slow:
+        logger.warning(
+            "Slow query (%.1f ms) from %s: %s", elapsed * 1000, _caller(), " ".join(statement.split())[:SLOW_QUERY_SQL_CHARS]
+        )
+
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += elapsed
+        stats.rows += rows
+        stats.slow += slow
+    else:
+        metrics.record_background(elapsed, rows, slow)
+
+    if _captures:
+        with _captures_lock:
+            for captured in _captures:
+                captured.append(statement)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = _pop_started(conn, context)
+    if started is None:
+        return
+    # Statements without a result set are writes; their affected count is known up front
+    rows = max(cursor.rowcount, 0) if cursor.description is None else 0
+    _record(statement, time.perf_counter() - started, rows)
+
+
+def _handle_error(exception_context):
+    """Failed statements (lock timeouts, constraint violations) still cost database time"""
+    if exception_context.connection is None:
+        return
+    started = _pop_started(exception_context.connection, exception_context.execution_context)
+    if started is not None and exception_context.statement is not None:
+        _record(exception_context.statement, time.perf_counter() - started, 0)
+
+
+def instrument_engine(engine):
+    """Attach the statement counters to an Engine (the sync_engine of an AsyncEngine)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+@contextmanager
+def query_budget(max_statements: int):
+    """
+    Test helper: fail with AssertionError when the block runs more than `max_statements`
+    statements (on any thread, e.g. the TestClient's app thread).
+
+        with query_budget(8):
+            client.post(f"/officer/final-approve/{entry_id}", headers=officer)
+    """
+    captured = []
+    with _captures_lock:
+        _captures.append(captured)
+    try:
+        yield captured
+    finally:
+        with _captures_lock:
+            _captures.remove(captured)
+    if len(captured) > max_statements:
+        listing = "\n".join(f"  {n}. {' '.join(sql.split())[:200]}" for n, sql in enumerate(captured, 1))
+        raise AssertionError(f"{len(captured)} statements exceed the budget of {max_statements}:\n{listing}")
+
+
+class _RouteTotals:
+    __slots__ = ("statuses", "duration_sum", "duration_buckets", "statements", "statement_buckets",
+                 "db_seconds", "rows", "slow")
+
+    def __init__(self):
+        self.statuses = {}
+        self.duration_sum = 0.0
+        self.duration_buckets = [0] * len(DURATION_BUCKETS)
+        self.statements = 0
+        self.statement_buckets = [0] * len(STATEMENT_BUCKETS)
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.slow = 0
+
+
+def _observe(buckets, bounds, value):
+    for i, bound in enumerate(bounds):
+        if value <= bound:
+            buckets[i] += 1
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class QueryMetrics:
+    """Process-wide aggregates per (method, route template)"""
+
+    def __init__(self):
+        self._routes = {}
+        self._background = RequestStats()
+        self._lock = threading.Lock()
+
+    def record(self, method: str, route: str, status: int, duration: float, stats: RequestStats):
+        with self._lock:
+            totals = self._routes.get((method, route))
+            if totals is None:
+                totals = self._routes[(method, route)] = _RouteTotals()
+            totals.statuses[status] = totals.statuses.get(status, 0) + 1
+            totals.duration_sum += duration
+            _observe(totals.duration_buckets, DURATION_BUCKETS, duration)
+            totals.statements += stats.statements
+            _observe(totals.statement_buckets, STATEMENT_BUCKETS, stats.statements)
+            totals.db_seconds += stats.db_seconds
+            totals.rows += stats.rows
+            totals.slow += stats.slow
+
+    def record_background(self, elapsed: float, rows: int, slow: bool):
+        """Statements outside any request (startup, background threads)"""
+        with self._lock:
+            self._background.statements += 1
+            self._background.db_seconds += elapsed
+            self._background.rows += rows
+            self._background.slow += slow
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+            self._background = RequestStats()
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        with self._lock:
+            routes = sorted(self._routes.items())
+            background = self._background
+            lines = []
+
+            def family(name, kind, help_text):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+            def histogram(name, key, totals, buckets, bounds, total_sum):
+                count = sum(totals.statuses.values())
+                for bound, value in zip(bounds, buckets):
+                    lines.append(f'{name}_bucket{{{key},le="{bound}"}} {value}')
+                lines.append(f'{name}_bucket{{{key},le="+Inf"}} {count}')
+                lines.append(f"{name}_sum{{{key}}} {total_sum}")
+                lines.append(f"{name}_count{{{key}}} {count}")
+
+            keys = [(f'method="{_label(method)}",route="{_label(route)}"', totals) for (method, route), totals in routes]
+
+            family("store_http_requests_total", "counter", "HTTP requests by route template and status code.")
+            for key, totals in keys:
+                for status, count in sorted(totals.statuses.items()):
+                    lines.append(f'store_http_requests_total{{{key},status="{status}"}} {count}')
+
+            family("store_http_request_duration_seconds", "histogram", "Request latency by route template.")
+            for key, totals in keys:
+                histogram("store_http_request_duration_seconds", key, totals, totals.duration_buckets,
+                          DURATION_BUCKETS, round(totals.duration_sum, 6))
+
+            family("store_db_statements_per_request", "histogram", "SQL statements executed per request.")
+            for key, totals in keys:
+                histogram("store_db_statements_per_request", key, totals, totals.statement_buckets,
+                          STATEMENT_BUCKETS, totals.statements)
+
+            background_key = f'method="",route="{BACKGROUND_ROUTE}"'
+            for name, help_text, attr in (
+                ("store_db_statements_total", "SQL statements executed.", "statements"),
+                ("store_db_time_seconds_total", "Time spent executing SQL statements.", "db_seconds"),
+                ("store_db_rows_affected_total", "Rows affected by INSERT / UPDATE / DELETE statements.", "rows"),
+                ("store_db_slow_queries_total", f"SQL statements slower than {SLOW_QUERY_MS:g} ms.", "slow"),
+            ):
+                family(name, "counter", help_text)
+                for key, totals in keys:
+                    value = getattr(totals, attr)
+                    lines.append(f"{name}{{{key}}} {round(value, 6) if isinstance(value, float) else value}")
+                value = getattr(background, attr)
+                lines.append(f"{name}{{{background_key}}} {round(value, 6) if isinstance(value, float) else value}")
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = QueryMetrics()
+
+
+class QueryMetricsMiddleware:
+    """ASGI middleware: track each HTTP request's statements and record them per route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        with track() as stats:
+            async def send_with_timing(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    timing = f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.statements} queries"'
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+                metrics.record(scope["method"], route, status, time.perf_counter() - started, stats)
@@ -0,0 +1,167 @@
+"""
+Inventory ledger: InventoryLog is the append-only journal of stock movements,
+InventorySnapshot holds periodic per-material balance checkpoints.
+
+A snapshot covers exactly the log rows with id <= its last_log_id. take_snapshots()
+reads that high-water mark while no ledger write is in flight (SQLite has a single
+writer; on Postgres the log is locked in SHARE mode for the few milliseconds the
+snapshot takes), so a movement that commits late is never skipped: it has a higher id
+and is picked up by the next snapshot.
+
+- stock_at(): balance of a material at time T = latest snapshot at or before T plus the
+  log rows after its last_log_id (index on inventory_logs (material_id, id)).
+- take_snapshots(): checkpoint every material that moved since its last snapshot.
+- reconcile(): compare Material.current_stock with the ledger for all materials in bulk.
+
+Run periodically (e.g. cron):
+    python -m backend.ledger snapshot
+    python -m backend.ledger reconcile
+"""
+import datetime
+import os
+import sys
+from typing import Optional
+
+from sqlalchemy import event, func, insert, or_, text
+from sqlalchemy.orm import Session
+
+from backend import models
+
+# Movements are stamped when inserted but only become visible when they commit; reports
+# treat periods that ended less than this long ago as still open
+SNAPSHOT_LAG = datetime.timedelta(minutes=int(os.getenv("LEDGER_SNAPSHOT_LAG_MINUTES", "5")))
+
+
+class LedgerError(Exception):
+    pass
+
+
+@event.listens_for(models.InventoryLog, "before_update")
+@event.listens_for(models.InventoryLog, "before_delete")
+def _reject_log_mutation(mapper, connection, target):
+    raise LedgerError("inventory_logs is append-only; post an ADJUSTMENT entry instead")
+
+
+def _latest_snapshots(db: Session, before: Optional[datetime.datetime] = None):
+    """Subquery: (material_id, last_log_id, balance) of each material's latest snapshot (at or before `before`)"""
+    snap = models.InventorySnapshot
+    latest = db.query(snap.material_id, func.max(snap.last_log_id).label("last_log_id"))
+    if before is not None:
+        latest = latest.filter(snap.as_of <= before)
+    latest = latest.group_by(snap.material_id).subquery()
+    return db.query(snap.material_id, snap.last_log_id, snap.balance).join(
+        latest, (snap.material_id == latest.c.material_id) & (snap.last_log_id == latest.c.last_log_id)
+    ).subquery()
+
+
+def ledger_balances(db: Session, at: Optional[datetime.datetime] = None) -> dict:
+    """material_id -> ledger balance at `at` (default: now) for every material with history"""
+    log = models.InventoryLog
+    snapshots = _latest_snapshots(db, at)
+
+    balances = dict(db.query(snapshots.c.material_id, snapshots.c.balance))
+
+    movements = db.query(log.material_id, func.sum(log.change_quantity)).outerjoin(
+        snapshots, snapshots.c.material_id == log.material_id
+    ).filter(
+        or_(snapshots.c.last_log_id.is_(None), log.id > snapshots.c.last_log_id)
+    )
+    if at is not None:
+        movements = movements.filter(log.created_at <= at)
+    for material_id, delta in movements.group_by(log.material_id):
+        balances[material_id] = balances.get(material_id, 0) + (delta or 0)
+    return balances
+
+
+def stock_at(db: Session, material_id: int, at: datetime.datetime) -> int:
+    """Balance of one material at time `at`: one snapshot lookup plus a short log range scan"""
+    snap = models.InventorySnapshot
+    log = models.InventoryLog
+
+    snapshot = db.query(snap.last_log_id, snap.balance).filter(
+        snap.material_id == material_id, snap.as_of <= at
+    ).order_by(snap.last_log_id.desc()).first()
+
+    movements = db.query(func.coalesce(func.sum(log.change_quantity), 0)).filter(
+        log.material_id == material_id, log.created_at <= at
+    )
+    if snapshot:
+        movements = movements.filter(log.id > snapshot.last_log_id)
+    return (snapshot.balance if snapshot else 0) + movements.scalar()
+
+
+def _lock_ledger(db: Session):
+    """Wait for in-flight ledger writes and hold off new ones until the snapshot commits"""
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("LOCK TABLE inventory_logs IN SHARE MODE"))
+
+
+def take_snapshots(db: Session) -> int:
+    """Checkpoint every material whose ledger moved since its last snapshot; returns rows written"""
+    log = models.InventoryLog
+    _lock_ledger(db)
+    high_water = db.query(func.max(log.id)).scalar()
+    if high_water is None:
+        db.commit()
+        return 0
+    # Every row at or below the high-water mark is committed, so this stamp is safe for stock_at()
+    as_of = models.get_ist_now()
+    snapshots = _latest_snapshots(db)
+
+    # Only materials with movements after their latest snapshot need a new one
+    moved = db.query(log.material_id, func.sum(log.change_quantity).label("delta"), snapshots.c.balance).outerjoin(
+        snapshots, snapshots.c.material_id == log.material_id
+    ).filter(
+        or_(snapshots.c.last_log_id.is_(None), log.id > snapshots.c.last_log_id),
+        log.id <= high_water
+    ).group_by(log.material_id, snapshots.c.balance).all()
+
+    rows = [
+        {"material_id": material_id, "as_of": as_of, "last_log_id": high_water, "balance": (previous or 0) + (delta or 0)}
+        for material_id, delta, previous in moved
+    ]
+    if rows:
+        db.execute(insert(models.InventorySnapshot), rows)
+    db.commit()
+    return len(rows)
+
+
+def reconcile(db: Session) -> list:
+    """Materials whose current_stock disagrees with the ledger, as drift reports"""
+    ledger = ledger_balances(db)
+    drift = []
+    for material_id, code, current_stock in db.query(
+        models.Material.id, models.Material.code, models.Material.current_stock
+    ).order_by(models.Material.id):
+        expected = ledger.get(material_id, 0)
+        if (current_stock or 0) != expected:
+            drift.append({
+                "material_id": material_id,
+                "material_code": code,
+                "current_stock": current_stock,
+                "ledger_balance": expected,
+                "drift": (current_stock or 0) - expected,
+            })
+    return drift
+
+
+if __name__ == "__main__":
+    from backend.database import SessionLocal, engine
+
+    models.Base.metadata.create_all(bind=engine)
+    command = sys.argv[1] if len(sys.argv) > 1 else "reconcile"
+    db = SessionLocal()
+    try:
+        if command == "snapshot":
+            print(f"✓ Wrote {take_snapshots(db)} snapshot(s).")
+        elif command == "reconcile":
+            drift = reconcile(db)
+            for row in drift:
+                print(f"   {row['material_code']}: stock {row['current_stock']} vs ledger {row['ledger_balance']} (drift {row['drift']:+d})")
+            print(f"{'✗' if drift else '✓'} {len(drift)} material(s) drifting from the ledger.")
+            sys.exit(1 if drift else 0)
+        else:
+            print("Usage: python -m backend.ledger [snapshot|reconcile]")
+            sys.exit(2)
+    finally:
+        db.close()
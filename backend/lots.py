@@ -0,0 +1,207 @@
+"""
+Lot-level stock: per-lot remaining quantities and FIFO / FEFO allocation of issues.
+
+Every InwardItem of a FINAL_APPROVED gate entry becomes a StockLot. Approving an issue
+draws the quantity from the material's live lots in policy order and records one
+IssueAllocation per lot touched, which doubles as the pick list (store_room / rack_no /
+shelf_no) for the store room.
+
+- FIFO: oldest receipt first.
+- FEFO: earliest expiry first; lots without an expiry date follow, oldest receipt first.
+
+Lots are read through partial indexes on live lots (quantity_remaining > 0) in allocation
+order and the scan stops as soon as the issue is covered, so allocation costs O(lots
+touched), never O(all lots). Material.current_stock stays the authority for "is there
+enough stock": quantity not backed by lots (e.g. stock predating lot tracking) is
+reported as unallocated instead of failing the approval.
+
+Backfill an existing database with `python -m backend.lots`.
+"""
+import os
+from typing import Optional
+
+from sqlalchemy import bindparam, delete, insert, literal_column, update
+from sqlalchemy.orm import Session
+
+from backend import models
+
+ALLOCATION_POLICIES = ("FIFO", "FEFO")
+ISSUE_ALLOCATION_POLICY = os.getenv("ISSUE_ALLOCATION_POLICY", "FEFO").upper()
+LOT_FETCH_BATCH = 16
+
+STOCK_LOTS_MARKER_KEY = "stock_lots_built"
+STOCK_LOTS_REBUILD_BATCH = 1000
+
+LOT_LOCATION_FIELDS = ("store_room", "rack_no", "shelf_no")
+
+
+def lot_rows(inward: models.InwardProcess, items) -> list:
+    """StockLot rows for the linked items of a just final-approved inward process"""
+    return [
+        {
+            "id": item.id,
+            "material_id": item.material_id,
+            "lot_number": item.lot_number,
+            "expiry_date": item.expiry_date,
+            "received_at": inward.final_approved_at,
+            "quantity_received": item.quantity_received,
+            "quantity_remaining": item.quantity_received,
+            "store_room": item.store_room,
+            "rack_no": item.rack_no,
+            "shelf_no": item.shelf_no,
+        }
+        for item in items
+        if item.material_id and item.quantity_received
+    ]
+
+
+def _live_lots(db: Session, material_id: int, policy: str):
+    """Yield the material's lots with stock left, in allocation order (row-locked where supported)"""
+    lot = models.StockLot
+    # Literal 0 (not a bound parameter) so prepared statements still match the partial indexes
+    live = db.query(lot.id, lot.quantity_remaining).filter(
+        lot.material_id == material_id, lot.quantity_remaining > literal_column("0")
+    )
+    if policy == "FEFO":
+        orderings = [
+            live.filter(lot.expiry_date.isnot(None)).order_by(lot.expiry_date, lot.received_at, lot.id),
+            live.filter(lot.expiry_date.is_(None)).order_by(lot.received_at, lot.id),
+        ]
+    else:
+        orderings = [live.order_by(lot.received_at, lot.id)]
+    for query in orderings:
+        # Small pages: an issue is usually covered by the first lot or two
+        offset = 0
+        while True:
+            page = query.offset(offset).limit(LOT_FETCH_BATCH).with_for_update().all()
+            yield from page
+            if len(page) < LOT_FETCH_BATCH:
+                break
+            offset += len(page)
+
+
+def allocate(db: Session, issue_id: int, material_id: int, quantity: int, policy: Optional[str] = None) -> int:
+    """
+    Draw `quantity` from the material's lots in `policy` order and record the allocations
+    (in the caller's transaction). Returns the quantity that no lot could cover.
+    """
+    policy = (policy or ISSUE_ALLOCATION_POLICY).upper()
+    if policy not in ALLOCATION_POLICIES:
+        raise ValueError(f"Unknown allocation policy {policy!r}")
+
+    needed = quantity
+    picks = []
+    for lot in _live_lots(db, material_id, policy):
+        take = min(lot.quantity_remaining, needed)
+        picks.append({"b_id": lot.id, "b_take": take})
+        needed -= take
+        if needed == 0:
+            break
+    if not picks:
+        return needed
+
+    lots = models.StockLot.__table__
+    db.execute(
+        update(lots)
+        .where(lots.c.id == bindparam("b_id"))
+        .values(quantity_remaining=lots.c.quantity_remaining - bindparam("b_take")),
+        picks
+    )
+    db.execute(insert(models.IssueAllocation), [
+        {"issue_id": issue_id, "lot_id": pick["b_id"], "quantity": pick["b_take"]} for pick in picks
+    ])
+    return needed
+
+
+def pick_list(db: Session, issue_id: int) -> list:
+    """Where to pick an approved issue from: one row per lot drawn down, in allocation order"""
+    allocation = models.IssueAllocation
+    lot = models.StockLot
+    rows = db.query(
+        allocation.quantity, lot.id, lot.lot_number, lot.expiry_date, lot.received_at,
+        lot.store_room, lot.rack_no, lot.shelf_no,
+    ).join(lot, allocation.lot_id == lot.id).filter(allocation.issue_id == issue_id).order_by(allocation.id)
+    return [
+        {
+            "lot_id": lot_id,
+            "lot_number": lot_number,
+            "expiry_date": expiry_date,
+            "received_at": received_at,
+            "quantity": quantity,
+            "store_room": store_room,
+            "rack_no": rack_no,
+            "shelf_no": shelf_no,
+        }
+        for quantity, lot_id, lot_number, expiry_date, received_at, store_room, rack_no, shelf_no in rows
+    ]
+
+
+def sync_locations(db: Session, changed_rows: list):
+    """Carry storage location corrections of final-approved inward items over to their lots"""
+    rows = [
+        {"id": row["id"], **{field: row[field] for field in LOT_LOCATION_FIELDS if field in row}}
+        for row in changed_rows
+        if any(field in row for field in LOT_LOCATION_FIELDS)
+    ]
+    if rows:
+        db.execute(update(models.StockLot), rows)
+
+
+def rebuild_stock_lots(db: Session) -> int:
+    """
+    Regenerate lots from final-approved inward items. Past issues were not allocated, so each
+    material's current stock is assumed to sit in its most recent receipts (FIFO consumption).
+    """
+    db.execute(delete(models.IssueAllocation))
+    db.execute(delete(models.StockLot))
+    stock = dict(db.query(models.Material.id, models.Material.current_stock))
+
+    items = db.query(models.InwardItem, models.InwardProcess).join(
+        models.InwardProcess, models.InwardItem.inward_process_id == models.InwardProcess.id
+    ).join(
+        models.GateEntry, models.InwardProcess.gate_entry_id == models.GateEntry.id
+    ).filter(
+        models.GateEntry.status == "FINAL_APPROVED",
+        models.InwardItem.material_id.isnot(None),
+    ).order_by(models.InwardProcess.final_approved_at.desc(), models.InwardItem.id.desc())
+
+    rows = []
+    total = 0
+    for item, inward in items.yield_per(STOCK_LOTS_REBUILD_BATCH):
+        for row in lot_rows(inward, [item]):
+            left = max(stock.get(row["material_id"]) or 0, 0)
+            row["quantity_remaining"] = min(row["quantity_received"], left)
+            stock[row["material_id"]] = left - row["quantity_remaining"]
+            rows.append(row)
+        if len(rows) >= STOCK_LOTS_REBUILD_BATCH:
+            db.execute(insert(models.StockLot), rows)
+            total += len(rows)
+            rows = []
+    if rows:
+        db.execute(insert(models.StockLot), rows)
+        total += len(rows)
+
+    marker = db.get(models.AppMetadata, STOCK_LOTS_MARKER_KEY)
+    if marker:
+        marker.value = str(total)
+    else:
+        db.add(models.AppMetadata(key=STOCK_LOTS_MARKER_KEY, value=str(total)))
+    db.commit()
+    return total
+
+
+def ensure_stock_lots(db: Session):
+    """Build lots once on databases that predate lot tracking"""
+    if db.get(models.AppMetadata, STOCK_LOTS_MARKER_KEY) is None:
+        rebuild_stock_lots(db)
+
+
+if __name__ == "__main__":
+    from backend.database import SessionLocal, engine
+
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        print(f"✓ Rebuilt {rebuild_stock_lots(db)} stock lot(s).")
+    finally:
+        db.close()
@@ -1,14 +1,38 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, Query, Request, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.routing import APIRoute
 from sqlalchemy.orm import Session
-from backend.database import engine, get_db
-from backend import models, schemas, crud, auth
-from datetime import timedelta, datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.database import engine, get_db, SessionLocal, ASYNC_DB, async_engine, get_async_db
+from backend import models, schemas, crud, auth, async_crud
+from backend.hashing import password_pool
+from backend.events import broker, topics_for_user
+from backend.material_cache import material_cache
+from backend.alerts import low_stock_alerts
+from backend import exports
+from backend import ledger
+from backend import lots
+from backend import reports
+from backend import health
+from backend.instrumentation import QueryMetricsMiddleware, metrics, METRICS_TOKEN, PROMETHEUS_CONTENT_TYPE
+from backend.pagination import InvalidCursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from typing import Optional
+from datetime import date, timedelta, datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from zoneinfo import ZoneInfo
+import asyncio
+import hmac
+import json
 from backend import seed
 
 models.Base.metadata.create_all(bind=engine)
 
+# Timestamps are stored as naive IST (see models.get_ist_now)
+IST = ZoneInfo("Asia/Kolkata")
+
 app = FastAPI(title="Store Management System")
 
 # CORS Configuration - CRITICAL for Vercel frontend to connect
@@ -22,17 +46,82 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allow all HTTP methods (GET, POST, PUT, DELETE, etc.)
     allow_headers=["*"],  # Allow all headers
+    expose_headers=["X-Next-Cursor", "Server-Timing", "ETag", "Last-Modified"],  # Pagination cursor, store timing telemetry, caching
 )
 
+# Statements, DB time and rows per request; aggregated per route at /metrics
+app.add_middleware(QueryMetricsMiddleware)
+
+@app.exception_handler(InvalidCursor)
+def invalid_cursor_handler(request: Request, exc: InvalidCursor):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+def not_modified(request: Request, response: Response, etag: str, last_modified: Optional[datetime]):
+    """
+    Conditional GET: stamp ETag/Last-Modified on the response and return a bare 304
+    when the client's copy is current, otherwise None.
+    """
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    if last_modified:
+        response.headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=IST).astimezone(timezone.utc), usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        fresh = if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+    elif last_modified and request.headers.get("if-modified-since"):
+        try:
+            since = parsedate_to_datetime(request.headers["if-modified-since"])
+            fresh = last_modified.replace(tzinfo=IST, microsecond=0) <= since
+        except (TypeError, ValueError):
+            fresh = False
+    else:
+        fresh = False
+
+    if fresh:
+        return Response(status_code=304, headers=dict(response.headers))
+    return None
+
+def paginated(response: Response, keyset, rows, limit: Optional[int]):
+    """
+    List endpoints accept ?limit=&cursor= and keep returning a plain JSON list.
+    Pages hold DEFAULT_PAGE_SIZE rows unless ?limit= (at most MAX_PAGE_SIZE) says
+    otherwise. When more rows follow, the cursor for the next page is sent in the
+    X-Next-Cursor header.
+    """
+    next_cursor = keyset.next_cursor(rows, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
+
 @app.on_event("startup")
 def startup_event():
+    password_pool.start()
     db = next(get_db())
-    seed.seed_default_users(db)
+    try:
+        seed.seed_default_users(db)
+        crud.init_resource_versions(db)
+        crud.ensure_store_inventory(db)
+        lots.ensure_stock_lots(db)
+        low_stock_alerts.load(db)
+    finally:
+        db.close()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    password_pool.shutdown()
+    broker.backend.close()
+
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    if async_engine is not None:
+        await async_engine.dispose()
 
 @app.post("/token", response_model=dict)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = crud.get_user_by_username(db, form_data.username)
-    if not user or not crud.verify_password(form_data.password, user.hashed_password):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    # bcrypt runs in the password pool; only the quick user lookup uses the request threadpool
+    user = await run_in_threadpool(crud.get_user_by_username, db, form_data.username)
+    if not user or not await password_pool.verify(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -67,6 +156,20 @@ def create_user_admin(
     
     return crud.create_user_by_admin(db, user_data)
 
+@app.get("/admin/password-pool", tags=["Admin"])
+def password_pool_stats(current_user: models.User = Depends(auth.get_current_active_user)):
+    """Queue depth and latency of the bcrypt worker pool"""
+    if current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return password_pool.stats()
+
+@app.get("/admin/material-cache", tags=["Admin"])
+def material_cache_stats(current_user: models.User = Depends(auth.get_current_active_user)):
+    """Hit/miss counters of this worker's material master cache"""
+    if current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return material_cache.stats()
+
 @app.get("/officers", response_model=list[schemas.UserListResponse], tags=["User Management"])
 def list_officers(
     db: Session = Depends(get_db),
@@ -97,13 +200,17 @@ def create_gate_entry(
 
 @app.get("/officer/pending-stage-1", response_model=list[schemas.GateEntryResponse])
 def get_officer_pending_entries(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
     if current_user.role != models.UserRole.OFFICER and current_user.role != models.UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Only Officers can view pending approvals")
         
-    return crud.get_pending_gate_entries_for_officer(db, current_user.id)
+    rows = crud.get_pending_gate_entries_for_officer(db, current_user.id, cursor=cursor, limit=limit)
+    return paginated(response, crud.GATE_ENTRY_KEYSET, rows, limit)
 
 @app.post("/gate-entry/{entry_id}/approve-stage-1", response_model=schemas.GateEntryResponse)
 def approve_gate_entry_stage_1(
@@ -140,38 +247,48 @@ def approve_gate_entry_stage_1(
 
 @app.get("/store/pending", response_model=list[schemas.GateEntryResponse])
 def get_store_pending_entries(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
     if current_user.role != models.UserRole.STORE_MANAGER and current_user.role != models.UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Only Store Manager can view pending entries")
         
-    return crud.get_pending_store_entries(db)
+    rows = crud.get_pending_store_entries(db, cursor=cursor, limit=limit)
+    return paginated(response, crud.GATE_ENTRY_KEYSET, rows, limit)
 
 @app.post("/store/{entry_id}/process", response_model=schemas.GateEntryResponse)
 def process_store_entry(
     entry_id: int,
     data: schemas.InwardProcessCreate,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
     if current_user.role != models.UserRole.STORE_MANAGER and current_user.role != models.UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Only Store Manager can process entries")
         
-    result = crud.process_store_entry(db, entry_id, data, current_user.id)
+    timings = {}
+    result = crud.process_store_entry(db, entry_id, data, current_user.id, timings=timings)
     
     if not result:
         raise HTTPException(status_code=400, detail="Entry not found or not in correct status")
         
-    if not result:
-        raise HTTPException(status_code=400, detail="Entry not found or not in correct status")
-        
+    # Per-phase durations, visible in browser devtools
+    response.headers["Server-Timing"] = ", ".join(f"{phase};dur={ms}" for phase, ms in timings.items())
     return result
 
 # --- Store Inventory View ---
 
 @app.get("/store/items", response_model=list[schemas.StoreItemResponse], tags=["Store Operations"])
 def get_store_items(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    officer_id: Optional[int] = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
@@ -180,8 +297,15 @@ def get_store_items(
     """
     if current_user.role not in [models.UserRole.STORE_MANAGER, models.UserRole.OFFICER, models.UserRole.ADMIN]:
         raise HTTPException(status_code=403, detail="Not authorized")
+
+    # The listing depends on who is asking, so the ETag is scoped to the user
+    version, last_modified = crud.get_resource_version(db, crud.STORE_ITEMS_RESOURCE)
+    cached = not_modified(request, response, f'W/"store-items-{version}-u{current_user.id}"', last_modified)
+    if cached:
+        return cached
         
-    return crud.get_store_items(db, user=current_user)
+    rows = crud.get_store_items(db, user=current_user, cursor=cursor, limit=limit, officer_id=officer_id)
+    return paginated(response, crud.STORE_ITEM_KEYSET, rows, limit)
 
 # --- Phase 4: Officer Final Approval & Inventory Update ---
 
@@ -207,7 +331,10 @@ def update_verification_details(
     if current_user.role != models.UserRole.OFFICER and current_user.role != models.UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Only Officers can update verification details")
         
-    result = crud.update_inward_process(db, entry_id, update_data)
+    try:
+        result = crud.update_inward_process(db, entry_id, update_data, user_id=current_user.id)
+    except crud.StockCorrectionError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
     
     if not result:
         raise HTTPException(status_code=400, detail="Update failed. Entry not found or invalid.")
@@ -279,13 +406,17 @@ def get_pending_issues(
 
 @app.get("/officer/approved-issues", response_model=list[schemas.MaterialIssueResponse])
 def get_officer_approved_issues(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
     if current_user.role != models.UserRole.OFFICER and current_user.role != models.UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Only Officers can view approved issues")
         
-    return crud.get_officer_approved_issues(db, current_user.id)
+    rows = crud.get_officer_approved_issues(db, current_user.id, cursor=cursor, limit=limit)
+    return paginated(response, crud.APPROVED_ISSUE_KEYSET, rows, limit)
 
 @app.post("/officer/issue/{issue_id}/approve")
 def approve_material_issue(
@@ -302,6 +433,9 @@ def approve_material_issue(
         # Could be not found, already approved, or low stock
         raise HTTPException(status_code=400, detail="Issue approval failed (check stock or status)")
     
+    material = material_cache.get(db, result.material_id)
+    picks = lots.pick_list(db, result.id)
+
     # Return as dictionary like in pending-issues
     return {
         "id": result.id,
@@ -313,11 +447,24 @@ def approve_material_issue(
         "status": result.status,
         "requested_by_id": result.requested_by_id,
         "issue_note_id": result.issue_note_id,
-        "material_name": result.material.name if result.material else None,
+        "material_name": material.name if material else None,
         "approved_at": result.approved_at,
-        "approver_name": current_user.username
+        "approver_name": current_user.username,
+        "picks": picks,
+        "unallocated_qty": result.quantity_requested - sum(pick["quantity"] for pick in picks)
     }
 
+@app.get("/issue/{issue_id}/picks", tags=["Inventory"])
+def get_issue_picks(
+    issue_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Lots and storage locations an approved issue was allocated from"""
+    if current_user.role not in [models.UserRole.STORE_MANAGER, models.UserRole.OFFICER, models.UserRole.ADMIN]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return lots.pick_list(db, issue_id)
+
 def approve_material_issue(
     issue_id: int,
     db: Session = Depends(get_db),
@@ -337,9 +484,22 @@ def approve_material_issue(
 # --- Master Data: Materials ---
 
 @app.get("/materials", response_model=list[schemas.MaterialResponse])
-def get_materials(db: Session = Depends(get_db)):
+def get_materials(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    search: Optional[str] = None,
+    category: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
     # Any authenticated user can view materials? Yes.
-    return crud.get_materials(db)
+    version, last_modified = crud.get_resource_version(db, crud.MATERIALS_RESOURCE)
+    cached = not_modified(request, response, f'W/"materials-{version}"', last_modified)
+    if cached:
+        return cached
+    rows = crud.get_materials(db, cursor=cursor, limit=limit, search=search, category=category)
+    return paginated(response, crud.MATERIAL_KEYSET, rows, limit)
 
 @app.post("/materials", response_model=schemas.MaterialResponse)
 def create_material(
@@ -351,74 +511,245 @@ def create_material(
         raise HTTPException(status_code=403, detail="Only Officers can create materials")
     return crud.create_material(db, material)
 
+# --- Live Queue Events (Server-Sent Events) ---
+
+SSE_HEARTBEAT_SECONDS = 15
+
+@app.get("/alerts/low-stock", tags=["Alerts"])
+def get_low_stock_alerts(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Materials whose current stock is below their min_stock_level, largest shortfall first"""
+    if current_user.role not in [models.UserRole.STORE_MANAGER, models.UserRole.OFFICER, models.UserRole.ADMIN]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return low_stock_alerts.active(db)
+
+@app.post("/events/stream-token", tags=["Events"])
+def create_stream_token(current_user: models.User = Depends(auth.get_current_active_user)):
+    """Short-lived token for opening /events/stream?token=... from EventSource"""
+    return {"token": auth.create_stream_token(current_user.username), "expires_in": auth.STREAM_TOKEN_EXPIRE_SECONDS}
+
+@app.get("/events/stream", tags=["Events"])
+async def stream_queue_events(
+    request: Request,
+    current_user: models.User = Depends(auth.get_stream_user)
+):
+    """
+    Push channel for dashboard queues. Each SSE message is named after the queue that
+    changed (pending-stage-1, store-pending, final-pending, pending-issues, approved-issues,
+    issue-history, store-items, materials, gate-entries) and carries {action, id, ...}, so
+    clients refetch only what changed. A `resync` message means events were dropped and
+    the client should reload its queues. Browsers authenticate with ?token= from
+    POST /events/stream-token (fetch a fresh one before reconnecting).
+    """
+    topics = topics_for_user(current_user)
+
+    async def event_source():
+        # Subscribed only once the body is iterated, so an unsent response leaks nothing
+        subscription = broker.subscribe(topics)
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                if subscription.overflowed:
+                    subscription.overflowed = False
+                    yield "event: resync\ndata: {}\n\n"
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                payload = {k: v for k, v in event.items() if k != "topics"}
+                yield f"event: {event['queue']}\ndata: {json.dumps(payload, default=str)}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# --- Inventory Ledger ---
+
+@app.get("/inventory/{material_id}/stock-at", tags=["Inventory"])
+def get_stock_at(
+    material_id: int,
+    at: datetime,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Stock of a material as of a past moment (IST), from the ledger"""
+    if current_user.role not in [models.UserRole.STORE_MANAGER, models.UserRole.OFFICER, models.UserRole.ADMIN]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if material_cache.get(db, material_id) is None:
+        raise HTTPException(status_code=404, detail="Material not found")
+    return {"material_id": material_id, "at": at, "stock": ledger.stock_at(db, material_id, at)}
+
+@app.post("/admin/ledger/snapshots", tags=["Admin"])
+def take_ledger_snapshots(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    if current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return {"snapshots_written": ledger.take_snapshots(db)}
+
+@app.get("/admin/ledger/reconcile", tags=["Admin"])
+def reconcile_ledger(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Materials whose current_stock drifts from the inventory ledger"""
+    if current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    drift = ledger.reconcile(db)
+    return {"drifting": len(drift), "materials": drift}
+
+# --- Reports ---
+
+REPORT_ROLES = [models.UserRole.STORE_MANAGER, models.UserRole.OFFICER, models.UserRole.ADMIN]
+MAX_REPORT_DAYS = 3660
+
+def report_period(date_from: Optional[date], date_to: Optional[date]):
+    """Default to the last 30 days (IST) ending today"""
+    date_to = date_to or models.get_ist_now().date()
+    date_from = date_from or date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    if (date_to - date_from).days >= MAX_REPORT_DAYS:
+        raise HTTPException(status_code=400, detail=f"Report period is limited to {MAX_REPORT_DAYS} days")
+    return date_from, date_to
+
+@app.get("/reports/movements", tags=["Reports"])
+def get_movement_report(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    group_by: str = Query("category", pattern="^(category|material_id)$"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Daily inward / issued quantities per category (or material)"""
+    if current_user.role not in REPORT_ROLES:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    date_from, date_to = report_period(date_from, date_to)
+    return {
+        "date_from": date_from, "date_to": date_to, "group_by": group_by,
+        "rows": reports.movement_report(db, date_from, date_to, group_by=group_by),
+    }
+
+@app.get("/reports/turnover", tags=["Reports"])
+def get_turnover_report(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Stock turnover per category: issued quantity / average of opening and closing stock"""
+    if current_user.role not in REPORT_ROLES:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    date_from, date_to = report_period(date_from, date_to)
+    return {"date_from": date_from, "date_to": date_to, "rows": reports.turnover_report(db, date_from, date_to)}
+
+@app.get("/reports/ageing", tags=["Reports"])
+def get_ageing_report(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Current stock per category by days since receipt, from the live stock lots"""
+    if current_user.role not in REPORT_ROLES:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return {"buckets": reports.AGEING_LABELS, "rows": reports.ageing_report(db)}
+
 # Utility for checking API status
 @app.get("/")
 def root():
     return {"message": "Store Management System API is running"}
 
-@app.get("/health")
-def health_check(db: Session = Depends(get_db)):
-    """Health check endpoint to verify database and users"""
-    try:
-        # Check database connectivity
-        user_count = db.query(models.User).count()
-        
-        # Get user details
-        users = db.query(models.User).all()
-        user_details = [
-            {
-                "username": u.username,
-                "role": u.role,
-                "is_active": u.is_active
-            }
-            for u in users
-        ]
-        
-        return {
-            "status": "healthy",
-            "database": "connected",
-            "user_count": user_count,
-            "users": user_details,
-            "timestamp": datetime.utcnow().isoformat()
-        }
-    except Exception as e:
-        return {
-            "status": "unhealthy",
-            "database": "error",
-            "error": str(e),
-            "timestamp": datetime.utcnow().isoformat()
-        }
+@app.get("/metrics", include_in_schema=False)
+def get_metrics(
+    token: Optional[str] = Depends(auth.optional_oauth2_scheme),
+    db: Session = Depends(get_db)
+):
+    """Request and database aggregates per route, Prometheus text format (admins or METRICS_TOKEN)"""
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    if not (METRICS_TOKEN and hmac.compare_digest(token, METRICS_TOKEN)):
+        current_user = auth.get_current_active_user(auth.get_user_from_token(token, db))
+        if current_user.role != models.UserRole.ADMIN:
+            raise HTTPException(status_code=403, detail="Admin access required")
+    return Response(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+readiness = health.build_readiness(engine)
+
+@app.get("/health/live", tags=["Health"])
+async def health_live():
+    """Liveness probe: the process is serving requests (no database access)"""
+    return {"status": "alive"}
+
+@app.get("/health/ready", tags=["Health"])
+async def health_ready():
+    """Readiness probe: cached SELECT 1 with a timeout, plus connection pool stats"""
+    result = await readiness.check()
+    return JSONResponse(status_code=200 if result["status"] == "ready" else 503, content=result)
+
+@app.get("/health", tags=["Health"])
+async def health_check():
+    """Legacy probe: always 200 while the process serves requests (no database access, no user data)"""
+    return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
+
+@app.get("/admin/diagnostics", tags=["Admin"])
+async def diagnostics(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Readiness, pool, user counts and in-process cache / worker stats (no user details)"""
+    if current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return {
+        "readiness": await readiness.check(),
+        "database": engine.dialect.name,
+        "async_pool": health.pool_stats(async_engine.sync_engine) if async_engine is not None else None,
+        "users": await run_in_threadpool(crud.get_user_counts, db),
+        "password_pool": password_pool.stats(),
+        "material_cache": material_cache.stats(),
+        "low_stock_alerts": low_stock_alerts.stats(),
+        "timestamp": datetime.utcnow().isoformat(),
+    }
 
 # Material Issue History and Receipt
 @app.get("/store/issue-history")
 def get_store_issue_history(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
     if current_user.role != models.UserRole.STORE_MANAGER and current_user.role != models.UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Only Store Managers can view issue history")
     
-    issues = crud.get_issue_history(db, current_user.id)
+    issues = crud.get_issue_history(db, current_user.id, cursor=cursor, limit=limit)
+    paginated(response, crud.ISSUE_HISTORY_KEYSET, issues, limit)
     
     # Return as list of dictionaries
-    response = []
-    for issue in issues:
-        response.append({
-            "id": issue.id,
-            "material_id": issue.material_id,
-            "quantity_requested": issue.quantity_requested,
-            "purpose": issue.purpose,
-            "requesting_dept": issue.requesting_dept,
-            "officer_id": issue.officer_id,
-            "status": issue.status,
-            "requested_by_id": issue.requested_by_id,
-            "issue_note_id": issue.issue_note_id,
-            "material_name": issue.material.name if issue.material else None,
-            "approved_at": issue.approved_at.isoformat() if issue.approved_at else None,
-            "approver_name": None
-        })
-    
-    return response
+    return [issue_history_row(issue) for issue in issues]
+
+def issue_history_row(issue: models.MaterialIssue) -> dict:
+    return {
+        "id": issue.id,
+        "material_id": issue.material_id,
+        "quantity_requested": issue.quantity_requested,
+        "purpose": issue.purpose,
+        "requesting_dept": issue.requesting_dept,
+        "officer_id": issue.officer_id,
+        "status": issue.status,
+        "requested_by_id": issue.requested_by_id,
+        "issue_note_id": issue.issue_note_id,
+        "material_name": issue.material.name if issue.material else None,
+        "approved_at": issue.approved_at.isoformat() if issue.approved_at else None,
+        "approver_name": issue.approver_name
+    }
 
 def get_store_issue_history(
     db: Session = Depends(get_db),
@@ -429,6 +760,215 @@ def get_store_issue_history(
         
     return crud.get_issue_history(db, current_user.id)
 
+# --- Async read paths (ASYNC_DB=1) ---
+# Same contracts as the sync list endpoints above, served by `async def` handlers on an
+# AsyncSession. When enabled they replace the sync routes in place.
+
+async_router = APIRouter()
+
+@async_router.get("/officer/pending-stage-1", response_model=list[schemas.GateEntryResponse])
+async def get_officer_pending_entries_async(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(auth.get_current_active_user_async)
+):
+    if current_user.role != models.UserRole.OFFICER and current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only Officers can view pending approvals")
+    rows = await async_crud.get_pending_gate_entries_for_officer(db, current_user.id, cursor=cursor, limit=limit)
+    return paginated(response, crud.GATE_ENTRY_KEYSET, rows, limit)
+
+@async_router.get("/store/pending", response_model=list[schemas.GateEntryResponse])
+async def get_store_pending_entries_async(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(auth.get_current_active_user_async)
+):
+    if current_user.role != models.UserRole.STORE_MANAGER and current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only Store Manager can view pending entries")
+    rows = await async_crud.get_pending_store_entries(db, cursor=cursor, limit=limit)
+    return paginated(response, crud.GATE_ENTRY_KEYSET, rows, limit)
+
+@async_router.get("/store/items", response_model=list[schemas.StoreItemResponse], tags=["Store Operations"])
+async def get_store_items_async(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    officer_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(auth.get_current_active_user_async)
+):
+    if current_user.role not in [models.UserRole.STORE_MANAGER, models.UserRole.OFFICER, models.UserRole.ADMIN]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    version, last_modified = await async_crud.get_resource_version(db, crud.STORE_ITEMS_RESOURCE)
+    cached = not_modified(request, response, f'W/"store-items-{version}-u{current_user.id}"', last_modified)
+    if cached:
+        return cached
+    rows = await async_crud.get_store_items(db, user=current_user, cursor=cursor, limit=limit, officer_id=officer_id)
+    return paginated(response, crud.STORE_ITEM_KEYSET, rows, limit)
+
+@async_router.get("/officer/pending-issues", response_model=list[schemas.MaterialIssueResponse])
+async def get_pending_issues_async(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(auth.get_current_active_user_async)
+):
+    if current_user.role != models.UserRole.OFFICER and current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only Officers can view pending issues")
+    return await async_crud.get_pending_issues(db, current_user.id)
+
+@async_router.get("/officer/approved-issues", response_model=list[schemas.MaterialIssueResponse])
+async def get_officer_approved_issues_async(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(auth.get_current_active_user_async)
+):
+    if current_user.role != models.UserRole.OFFICER and current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only Officers can view approved issues")
+    rows = await async_crud.get_officer_approved_issues(db, current_user.id, cursor=cursor, limit=limit)
+    return paginated(response, crud.APPROVED_ISSUE_KEYSET, rows, limit)
+
+@async_router.get("/materials", response_model=list[schemas.MaterialResponse])
+async def get_materials_async(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    search: Optional[str] = None,
+    category: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    version, last_modified = await async_crud.get_resource_version(db, crud.MATERIALS_RESOURCE)
+    cached = not_modified(request, response, f'W/"materials-{version}"', last_modified)
+    if cached:
+        return cached
+    rows = await async_crud.get_materials(db, cursor=cursor, limit=limit, search=search, category=category)
+    return paginated(response, crud.MATERIAL_KEYSET, rows, limit)
+
+@async_router.get("/store/issue-history")
+async def get_store_issue_history_async(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(auth.get_current_active_user_async)
+):
+    if current_user.role != models.UserRole.STORE_MANAGER and current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only Store Managers can view issue history")
+    issues = await async_crud.get_issue_history(db, current_user.id, cursor=cursor, limit=limit)
+    paginated(response, crud.ISSUE_HISTORY_KEYSET, issues, limit)
+    return [issue_history_row(issue) for issue in issues]
+
+def use_async_routes(router: APIRouter):
+    """Swap each sync route for its async twin (same path and method), keeping route order"""
+    replacements = {(route.path, frozenset(route.methods)): route for route in router.routes}
+    app.router.routes[:] = [
+        replacements.get((route.path, frozenset(route.methods)), route) if isinstance(route, APIRoute) else route
+        for route in app.router.routes
+    ]
+
+if ASYNC_DB:
+    use_async_routes(async_router)
+
+# --- Audit Exports (streamed) ---
+
+def export_response(statement, name: str, fmt: str, gzip: bool):
+    filename = f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        exports.stream_export(statement, fmt=fmt, gzip=gzip),
+        media_type="application/gzip" if gzip else exports.EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+@app.get("/export/store-items", tags=["Exports"])
+def export_store_items(
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    officer_id: Optional[int] = None,
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Full store inventory dump (inward_date within [date_from, date_to))"""
+    if current_user.role not in [models.UserRole.STORE_MANAGER, models.UserRole.OFFICER, models.UserRole.ADMIN]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if current_user.role == models.UserRole.OFFICER:
+        officer_id = current_user.id
+    statement = exports.store_items_statement(officer_id=officer_id, date_from=date_from, date_to=date_to)
+    return export_response(statement, "store_items", fmt, gzip)
+
+@app.get("/export/issue-history", tags=["Exports"])
+def export_issue_history(
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    officer_id: Optional[int] = None,
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Material issues (created_at within [date_from, date_to)); Store Managers get their own requests"""
+    if current_user.role != models.UserRole.STORE_MANAGER and current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only Store Managers can export issue history")
+    requested_by_id = current_user.id if current_user.role == models.UserRole.STORE_MANAGER else None
+    statement = exports.issue_history_statement(
+        requested_by_id=requested_by_id, officer_id=officer_id, date_from=date_from, date_to=date_to
+    )
+    return export_response(statement, "issue_history", fmt, gzip)
+
+@app.get("/export/inventory-logs", tags=["Exports"])
+def export_inventory_logs(
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    officer_id: Optional[int] = None,
+    material_id: Optional[int] = None,
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Stock ledger (created_at within [date_from, date_to)); officer_id filters on who posted the movement"""
+    if current_user.role != models.UserRole.STORE_MANAGER and current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only Store Managers can export inventory logs")
+    statement = exports.inventory_logs_statement(
+        officer_id=officer_id, material_id=material_id, date_from=date_from, date_to=date_to
+    )
+    return export_response(statement, "inventory_logs", fmt, gzip)
+
+@app.get("/issue/receipts", tags=["Exports"])
+def download_issue_receipts(
+    ids: Optional[list[int]] = Query(None),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """
+    Zip of receipts for approved issues, chosen by ?ids=1&ids=2... and/or an approval date
+    range [date_from, date_to). Each file matches /issue/{issue_id}/receipt byte for byte.
+    """
+    if current_user.role != models.UserRole.STORE_MANAGER and current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only Store Managers can download receipts in bulk")
+    if not ids and date_from is None and date_to is None:
+        raise HTTPException(status_code=400, detail="Provide issue ids or a date range")
+
+    def receipt_files():
+        db = SessionLocal()
+        try:
+            for issue, receipt in crud.iter_issue_receipts(db, issue_ids=ids, date_from=date_from, date_to=date_to):
+                yield f"receipt_issue_{issue.id}.txt", receipt
+        finally:
+            db.close()
+
+    filename = f"receipts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return StreamingResponse(
+        exports.stream_zip(receipt_files()),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
 @app.get("/issue/{issue_id}/receipt")
 def download_issue_receipt(
     issue_id: int,
@@ -0,0 +1,160 @@
+"""
+Process-local cache of Material master data (code, name, category, unit, ...).
+
+Master rows change rarely but are read on most screens. Stock is deliberately NOT
+cached: current_stock is always read from the database.
+
+Invalidation:
+- Write-through: crud drops the touched ids locally after committing a master change.
+- Cross-worker: master writes also bump the "material-master" resource version in the
+  same transaction. Each worker re-reads that counter (one primary-key lookup) at most
+  every MATERIAL_CACHE_REVALIDATE_SECONDS and clears its cache when it moved.
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from backend import models
+
+MATERIAL_MASTER_RESOURCE = "material-master"
+
+
+@dataclass(frozen=True)
+class MaterialMaster:
+    id: int
+    code: str
+    name: str
+    description: Optional[str]
+    category: str
+    unit: str
+    min_stock_level: int
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(
+            id=row.id,
+            code=row.code,
+            name=row.name,
+            description=row.description,
+            category=row.category,
+            unit=row.unit,
+            min_stock_level=row.min_stock_level,
+        )
+
+
+_MASTER_COLUMNS = (
+    models.Material.id,
+    models.Material.code,
+    models.Material.name,
+    models.Material.description,
+    models.Material.category,
+    models.Material.unit,
+    models.Material.min_stock_level,
+)
+
+
+class MaterialCache:
+    def __init__(self, revalidate_seconds: float = 2.0):
+        self.revalidate_seconds = revalidate_seconds
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._by_id = {}
+        self._id_by_code = {}
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _revalidate(self, db: Session):
+        now = time.monotonic()
+        if now - self._checked_at < self.revalidate_seconds:
+            return
+        from backend import crud
+
+        version, _ = crud.get_resource_version(db, MATERIAL_MASTER_RESOURCE)
+        with self._lock:
+            if version != self._version:
+                if self._version is not None:
+                    self.invalidations += 1
+                self._by_id.clear()
+                self._id_by_code.clear()
+                self._version = version
+            self._checked_at = now
+
+    def _store(self, rows):
+        with self._lock:
+            for row in rows:
+                master = MaterialMaster.from_row(row)
+                self._by_id[master.id] = master
+                self._id_by_code[master.code] = master.id
+
+    def get_many(self, db: Session, material_ids: Iterable[int]) -> dict:
+        """id -> MaterialMaster for every id that exists; misses are loaded with one IN query"""
+        self._revalidate(db)
+        wanted = {material_id for material_id in material_ids if material_id is not None}
+        found = {}
+        with self._lock:
+            for material_id in wanted:
+                master = self._by_id.get(material_id)
+                if master is not None:
+                    found[material_id] = master
+            self.hits += len(found)
+            self.misses += len(wanted) - len(found)
+
+        missing = wanted - found.keys()
+        if missing:
+            rows = db.query(*_MASTER_COLUMNS).filter(models.Material.id.in_(missing)).all()
+            self._store(rows)
+            found.update((row.id, MaterialMaster.from_row(row)) for row in rows)
+        return found
+
+    def get(self, db: Session, material_id: Optional[int]) -> Optional[MaterialMaster]:
+        if material_id is None:
+            return None
+        return self.get_many(db, [material_id]).get(material_id)
+
+    def get_by_code(self, db: Session, code: str) -> Optional[MaterialMaster]:
+        self._revalidate(db)
+        with self._lock:
+            material_id = self._id_by_code.get(code)
+            master = self._by_id.get(material_id) if material_id is not None else None
+            if master is not None:
+                self.hits += 1
+                return master
+            self.misses += 1
+        row = db.query(*_MASTER_COLUMNS).filter(models.Material.code == code).first()
+        if row is None:
+            return None
+        self._store([row])
+        return MaterialMaster.from_row(row)
+
+    def invalidate(self, material_ids: Optional[Iterable[int]] = None):
+        """Drop the given ids (or everything) from this worker's cache"""
+        with self._lock:
+            self.invalidations += 1
+            if material_ids is None:
+                self._by_id.clear()
+                self._id_by_code.clear()
+                return
+            for material_id in material_ids:
+                master = self._by_id.pop(material_id, None)
+                if master is not None:
+                    self._id_by_code.pop(master.code, None)
+
+    def stats(self):
+        return {
+            "size": len(self._by_id),
+            "version": self._version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+material_cache = MaterialCache(
+    revalidate_seconds=float(os.getenv("MATERIAL_CACHE_REVALIDATE_SECONDS", "2"))
+)
@@ -0,0 +1,30 @@
+"""
+Migration script to build the indexes declared in models.py on an existing database.
+create_all() only creates missing tables, so databases created before an index was
+added to the models never get it. Safe to run repeatedly: existing indexes are skipped.
+"""
+from sqlalchemy import inspect
+
+from backend.database import engine, DATABASE_URL
+from backend import models
+
+def migrate_add_indexes():
+    print(f"Connecting to {DATABASE_URL}...")
+    models.Base.metadata.create_all(bind=engine)
+    inspector = inspect(engine)
+
+    created = 0
+    for table in models.Base.metadata.sorted_tables:
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda ix: ix.name):
+            if index.name in existing:
+                continue
+            columns = ", ".join(getattr(expr, "name", None) or str(expr) for expr in index.expressions)
+            print(f"Creating index {index.name} on {table.name} ({columns})...")
+            index.create(bind=engine)
+            created += 1
+
+    print(f"\n✓ Migration completed successfully! {created} index(es) created.")
+
+if __name__ == "__main__":
+    migrate_add_indexes()
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Enum, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Enum, Text, Index
+from sqlalchemy.orm import relationship, column_property
 from sqlalchemy.sql import func, text
 import enum
 from datetime import datetime
@@ -68,6 +68,32 @@ class Material(Base):
     
     current_stock = Column(Integer, default=0) # Denormalized for quick access
 
+    __table_args__ = (
+        # Stock headroom; "current_stock - min_stock_level < 0" (low stock) is an index range scan
+        Index("ix_materials_stock_headroom", current_stock - min_stock_level),
+    )
+
+class AppMetadata(Base):
+    """
+    Key/value markers for one-off bootstrap tasks (e.g. default user seed version).
+    """
+    __tablename__ = "app_metadata"
+
+    key = Column(String, primary_key=True)
+    value = Column(String, nullable=True)
+    updated_at = Column(DateTime, default=get_ist_now, onupdate=get_ist_now)
+
+class ResourceVersion(Base):
+    """
+    Change counter per cacheable resource (e.g. "materials", "store-items").
+    Bumped by crud in the write's own transaction; drives ETag/Last-Modified.
+    """
+    __tablename__ = "resource_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=get_ist_now)
+
 # --- Transactions ---
 
 class GateEntry(Base):
@@ -102,6 +128,11 @@ class GateEntry(Base):
     
     inward_process = relationship("InwardProcess", back_populates="gate_entry", uselist=False)
 
+    __table_args__ = (
+        # Officer queues: pending stage-1 / final approval per officer
+        Index("ix_gate_entries_officer_status", "request_officer_id", "status"),
+    )
+
 
 class InwardProcess(Base):
     """
@@ -139,7 +170,7 @@ class InwardItem(Base):
     __tablename__ = "inward_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    inward_process_id = Column(Integer, ForeignKey("inward_processes.id"))
+    inward_process_id = Column(Integer, ForeignKey("inward_processes.id"), index=True)
     
     material_id = Column(Integer, ForeignKey("materials.id"), nullable=True) # Linked to master
     quantity_received = Column(Integer)
@@ -162,6 +193,72 @@ class InwardItem(Base):
     inward_process = relationship("InwardProcess", back_populates="items")
     material = relationship("Material")
 
+class StoreInventory(Base):
+    """
+    Denormalised projection behind /store/items: one row per InwardItem of a
+    FINAL_APPROVED gate entry, with material master and officer details resolved.
+    Maintained by crud (final approval, item edits, master updates); rebuild with
+    `python -m backend.rebuild_store_inventory`.
+    """
+    __tablename__ = "store_inventory"
+
+    id = Column(Integer, ForeignKey("inward_items.id"), primary_key=True) # InwardItem ID
+    gate_entry_id = Column(Integer, ForeignKey("gate_entries.id"), index=True)
+    officer_id = Column(Integer, ForeignKey("users.id"))
+    officer_name = Column(String, nullable=True)
+    material_id = Column(Integer, ForeignKey("materials.id"), nullable=True, index=True)
+    material_name = Column(String)
+    material_code = Column(String)
+    category = Column(String)
+    quantity = Column(Integer)
+    unit = Column(String)
+    store_room = Column(String, nullable=True)
+    rack_no = Column(String, nullable=True)
+    shelf_no = Column(String, nullable=True)
+    inward_date = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Officer view: own items in id order
+        Index("ix_store_inventory_officer_id", "officer_id", "id"),
+    )
+
+class StockLot(Base):
+    """
+    Remaining quantity of one received lot (one InwardItem of a FINAL_APPROVED gate entry).
+    Issues draw lots down FIFO / FEFO; see backend/lots.py.
+    """
+    __tablename__ = "stock_lots"
+
+    id = Column(Integer, ForeignKey("inward_items.id"), primary_key=True) # InwardItem ID
+    material_id = Column(Integer, ForeignKey("materials.id"))
+    lot_number = Column(String, nullable=True)
+    expiry_date = Column(DateTime, nullable=True)
+    received_at = Column(DateTime)
+    quantity_received = Column(Integer)
+    quantity_remaining = Column(Integer)
+    store_room = Column(String, nullable=True)
+    rack_no = Column(String, nullable=True)
+    shelf_no = Column(String, nullable=True)
+
+    __table_args__ = (
+        # Allocation order per material, live lots only, so depleted lots are never scanned
+        Index("ix_stock_lots_fifo", "material_id", "received_at", "id",
+              sqlite_where=text("quantity_remaining > 0"), postgresql_where=text("quantity_remaining > 0")),
+        Index("ix_stock_lots_fefo", "material_id", "expiry_date", "received_at", "id",
+              sqlite_where=text("quantity_remaining > 0"), postgresql_where=text("quantity_remaining > 0")),
+    )
+
+class IssueAllocation(Base):
+    """Quantity of a MaterialIssue drawn from one StockLot"""
+    __tablename__ = "issue_allocations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    issue_id = Column(Integer, ForeignKey("material_issues.id"), index=True)
+    lot_id = Column(Integer, ForeignKey("stock_lots.id"))
+    quantity = Column(Integer)
+
+    lot = relationship("StockLot")
+
 class InventoryLog(Base):
     __tablename__ = "inventory_logs"
 
@@ -173,6 +270,30 @@ class InventoryLog(Base):
     reference_id = Column(String) # Gate Pass No or Issue ID
     created_at = Column(DateTime, default=get_ist_now)
     created_by_id = Column(Integer, ForeignKey("users.id"))
+
+    __table_args__ = (
+        Index("ix_inventory_logs_material_created", "material_id", "created_at"),
+        Index("ix_inventory_logs_material_id", "material_id", "id"),
+    )
+    
+class InventorySnapshot(Base):
+    """
+    Periodic per-material balance checkpoint of the inventory ledger:
+    balance = sum of InventoryLog.change_quantity with id <= last_log_id
+    (all of which were committed by as_of).
+    """
+    __tablename__ = "inventory_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    material_id = Column(Integer, ForeignKey("materials.id"))
+    as_of = Column(DateTime)
+    last_log_id = Column(Integer)
+    balance = Column(Integer)
+    created_at = Column(DateTime, default=get_ist_now)
+
+    __table_args__ = (
+        Index("ix_inventory_snapshots_material_as_of", "material_id", "as_of"),
+    )
     
 class MaterialIssue(Base):
     __tablename__ = "material_issues"
@@ -190,11 +311,22 @@ class MaterialIssue(Base):
     requested_by_id = Column(Integer, ForeignKey("users.id"))
     approved_by_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     approved_at = Column(DateTime, nullable=True)  # Timestamp of approval
+    # Never-NULL approval time for ordering and keyset cursors; legacy rows without
+    # approved_at (or created_at) still get a position
+    approval_order = column_property(func.coalesce(approved_at, created_at, datetime(1970, 1, 1)))
     
     # Issue Note
     issue_note_id = Column(String, unique=True, nullable=True) # Generated upon approval
     
     material = relationship("Material")
+    approved_by = relationship("User", foreign_keys=[approved_by_id])
+
+    __table_args__ = (
+        # Officer pending/approved issue queues
+        Index("ix_material_issues_officer_status", "officer_id", "status"),
+        # Store manager issue history (ordered by id desc)
+        Index("ix_material_issues_requester_id", "requested_by_id", "id"),
+    )
     
     @property
     def material_name(self):
@@ -207,3 +339,7 @@ class MaterialIssue(Base):
     @property
     def material_unit(self):
         return self.material.unit if self.material else None
+
+    @property
+    def approver_name(self):
+        return self.approved_by.username if self.approved_by else None
@@ -0,0 +1,89 @@
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import and_, or_
+
+MAX_PAGE_SIZE = 500
+# Page size when a list endpoint is called without ?limit=
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
+
+
+def page_size(limit: Optional[int]) -> int:
+    """Rows per page: `limit` capped at MAX_PAGE_SIZE, DEFAULT_PAGE_SIZE when not given"""
+    return min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values) -> str:
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Malformed cursor")
+    if not isinstance(values, list):
+        raise InvalidCursor("Malformed cursor")
+    return values
+
+
+class Keyset:
+    """
+    Keyset (seek) pagination over one or more columns, e.g. (approved_at, id).
+    The last column must be unique so every row has a distinct position.
+    The cursor is an opaque token holding the key values of the last row returned.
+    """
+
+    def __init__(self, *columns, descending: bool = False):
+        self.columns = columns
+        self.descending = descending
+
+    def _coerce(self, column, value):
+        if value is not None and column.type.python_type is datetime:
+            return datetime.fromisoformat(value)
+        return value
+
+    def apply(self, query, cursor: Optional[str] = None, limit: Optional[int] = None):
+        """Order the query by the key columns, seek past `cursor` and take one page"""
+        if self.descending:
+            query = query.order_by(*[col.desc() for col in self.columns])
+        else:
+            query = query.order_by(*[col.asc() for col in self.columns])
+
+        if cursor:
+            values = decode_cursor(cursor)
+            if len(values) != len(self.columns):
+                raise InvalidCursor("Cursor does not match this listing")
+            try:
+                values = [self._coerce(col, v) for col, v in zip(self.columns, values)]
+            except (ValueError, TypeError):
+                raise InvalidCursor("Malformed cursor")
+            query = query.filter(self._after(values))
+
+        return query.limit(page_size(limit))
+
+    def _after(self, values):
+        # (a, b) > (x, y)  ==  a > x OR (a = x AND b > y), written out for portability
+        clauses = []
+        for i, (col, value) in enumerate(zip(self.columns, values)):
+            step = col < value if self.descending else col > value
+            prefix = [c == v for c, v in zip(self.columns[:i], values[:i])]
+            clauses.append(and_(*prefix, step) if prefix else step)
+        return or_(*clauses)
+
+    def next_cursor(self, rows, limit: Optional[int]) -> Optional[str]:
+        """Cursor for the following page, or None when this page is the last one"""
+        if len(rows) < page_size(limit):
+            return None
+        last = rows[-1]
+        return encode_cursor([getattr(last, col.key) for col in self.columns])
@@ -0,0 +1,21 @@
+"""
+Regenerate the store_inventory projection (behind /store/items) from the source tables.
+Run after restoring a backup or editing inward data by hand:
+
+    python -m backend.rebuild_store_inventory
+"""
+from backend.database import SessionLocal, engine
+from backend import models, crud
+
+def rebuild():
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        print("Rebuilding store inventory projection...")
+        total = crud.rebuild_store_inventory(db)
+        print(f"✓ Projected {total} store item(s).")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rebuild()
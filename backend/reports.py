@@ -0,0 +1,237 @@
+"""
+Inventory movement, turnover and ageing reports.
+
+Source rows (inventory_logs, inward_items) are pulled in columnar batches (yield_per
+partitions -> NumPy arrays) and aggregated with vectorised group-bys (np.unique +
+np.bincount) per category / material / day.
+
+Daily movement aggregates and end-of-day ledger balances are cached per closed day: a
+day's numbers cannot change once it is over (plus the ledger's snapshot lag), so
+historical periods are computed once per worker and only still-open days are
+recalculated on each request. The ageing report describes stock on hand right now, so
+it has no closed days to cache; it reads the live stock lots instead of the receipt
+history, so its cost follows the lots still in stock, not the age of the database.
+"""
+import datetime
+from dataclasses import dataclass
+
+import numpy as np
+from sqlalchemy import literal_column, select
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.cache import TTLCache
+from backend.ledger import SNAPSHOT_LAG, ledger_balances
+
+REPORT_BATCH_SIZE = 10000
+AGEING_BUCKETS = (30, 60, 90, 180)  # days; last bucket is "over 180"
+AGEING_LABELS = ("0-30", "31-60", "61-90", "91-180", "180+")
+UNCATEGORISED = "UNCATEGORISED"
+
+# Closed-day aggregates; ten years of days fits comfortably
+_closed_days = TTLCache(maxsize=3660, ttl=7 * 24 * 3600)
+# End-of-day balances of closed days (turnover opening / closing stock)
+_closed_balances = TTLCache(maxsize=366, ttl=7 * 24 * 3600)
+
+
+@dataclass(frozen=True)
+class DayMovements:
+    material_ids: np.ndarray
+    inward: np.ndarray
+    issued: np.ndarray
+
+
+_EMPTY_DAY = DayMovements(np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0))
+
+
+def _day_start(day: datetime.date) -> datetime.datetime:
+    return datetime.datetime.combine(day, datetime.time.min)
+
+
+def _is_closed(day: datetime.date) -> bool:
+    return _day_start(day + datetime.timedelta(days=1)) + SNAPSHOT_LAG <= models.get_ist_now()
+
+
+def _columns(db: Session, statement, n_columns: int):
+    """Run a statement and return its columns as NumPy object arrays, fetched in partitions"""
+    chunks = [[] for _ in range(n_columns)]
+    result = db.execute(statement.execution_options(yield_per=REPORT_BATCH_SIZE))
+    for partition in result.partitions():
+        for i, column in enumerate(zip(*partition)):
+            chunks[i].append(np.array(column, dtype=object))
+    return [np.concatenate(parts) if parts else np.zeros(0, dtype=object) for parts in chunks]
+
+
+def _aggregate_days(db: Session, first_day: datetime.date, last_day: datetime.date) -> dict:
+    """date -> DayMovements for every day in [first_day, last_day] (one query, vectorised)"""
+    log = models.InventoryLog
+    statement = select(log.material_id, log.created_at, log.change_quantity, log.transaction_type).where(
+        log.created_at >= _day_start(first_day),
+        log.created_at < _day_start(last_day + datetime.timedelta(days=1)),
+        log.material_id.isnot(None),
+    )
+    material_ids, created_at, change, kind = _columns(db, statement, 4)
+    n_days = (last_day - first_day).days + 1
+    days = {first_day + datetime.timedelta(days=i): _EMPTY_DAY for i in range(n_days)}
+    if len(material_ids) == 0:
+        return days
+
+    material_ids = material_ids.astype(np.int64)
+    change = change.astype(np.float64)
+    origin = np.datetime64(_day_start(first_day), "D")
+    day_index = (created_at.astype("datetime64[us]").astype("datetime64[D]") - origin).astype(np.int64)
+
+    # Group by (day, material) via a composite key
+    keys = day_index * (material_ids.max() + 1) + material_ids
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    inward = np.bincount(inverse, weights=np.where(kind == "INWARD", change, 0.0))
+    issued = np.bincount(inverse, weights=np.where(kind == "ISSUE", -change, 0.0))
+    key_day = unique_keys // (material_ids.max() + 1)
+    key_material = unique_keys % (material_ids.max() + 1)
+
+    for i in np.unique(key_day):
+        mask = key_day == i
+        days[first_day + datetime.timedelta(days=int(i))] = DayMovements(key_material[mask], inward[mask], issued[mask])
+    return days
+
+
+def daily_movements(db: Session, date_from: datetime.date, date_to: datetime.date) -> dict:
+    """date -> DayMovements over [date_from, date_to], reusing cached closed days"""
+    wanted = [date_from + datetime.timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+    result = {}
+    missing = []
+    for day in wanted:
+        cached = _closed_days.get(day)
+        if cached is None:
+            missing.append(day)
+        else:
+            result[day] = cached
+    if missing:
+        computed = _aggregate_days(db, missing[0], missing[-1])
+        for day in missing:
+            result[day] = computed[day]
+            if _is_closed(day):
+                _closed_days.set(day, computed[day])
+    return result
+
+
+def balances_at_end_of(db: Session, day: datetime.date) -> dict:
+    """material_id -> ledger balance at the end of `day`, cached once the day is closed"""
+    cached = _closed_balances.get(day)
+    if cached is not None:
+        return cached
+    balances = ledger_balances(db, _day_start(day + datetime.timedelta(days=1)) - datetime.timedelta(microseconds=1))
+    if _is_closed(day):
+        _closed_balances.set(day, balances)
+    return balances
+
+
+def _categories(db: Session) -> dict:
+    return {material_id: category or UNCATEGORISED for material_id, category in db.query(models.Material.id, models.Material.category)}
+
+
+def movement_report(db: Session, date_from: datetime.date, date_to: datetime.date, group_by: str = "category") -> list:
+    """Inward / issued / net quantity per day and category (or material)"""
+    days = daily_movements(db, date_from, date_to)
+    categories = _categories(db) if group_by == "category" else None
+
+    rows = []
+    for day, movements in sorted(days.items()):
+        if len(movements.material_ids) == 0:
+            continue
+        if categories is None:
+            labels = movements.material_ids
+        else:
+            labels = np.array([categories.get(int(m), UNCATEGORISED) for m in movements.material_ids], dtype=object)
+        groups, inverse = np.unique(labels, return_inverse=True)
+        inward = np.bincount(inverse, weights=movements.inward, minlength=len(groups))
+        issued = np.bincount(inverse, weights=movements.issued, minlength=len(groups))
+        for group, inward_qty, issued_qty in zip(groups, inward, issued):
+            rows.append({
+                "day": day.isoformat(),
+                group_by: group.item() if hasattr(group, "item") else group,
+                "inward_qty": int(inward_qty),
+                "issued_qty": int(issued_qty),
+                "net_qty": int(inward_qty - issued_qty),
+            })
+    return rows
+
+
+def turnover_report(db: Session, date_from: datetime.date, date_to: datetime.date) -> list:
+    """Per category: issued quantity over the period / average of opening and closing stock"""
+    days = daily_movements(db, date_from, date_to)
+    categories = _categories(db)
+    opening = balances_at_end_of(db, date_from - datetime.timedelta(days=1))
+    closing = balances_at_end_of(db, date_to)
+
+    material_ids = np.array(sorted(categories), dtype=np.int64)
+    labels = np.array([categories[m] for m in material_ids], dtype=object)
+    index = {m: i for i, m in enumerate(material_ids.tolist())}
+
+    issued = np.zeros(len(material_ids))
+    for movements in days.values():
+        if len(movements.material_ids):
+            positions = np.array([index.get(int(m), -1) for m in movements.material_ids])
+            known = positions >= 0
+            np.add.at(issued, positions[known], movements.issued[known])
+    open_stock = np.array([opening.get(m, 0) for m in material_ids.tolist()], dtype=np.float64)
+    close_stock = np.array([closing.get(m, 0) for m in material_ids.tolist()], dtype=np.float64)
+
+    groups, inverse = np.unique(labels, return_inverse=True) if len(labels) else (np.array([]), np.array([], dtype=np.int64))
+    sums = {
+        name: np.bincount(inverse, weights=values, minlength=len(groups))
+        for name, values in (("issued", issued), ("opening", open_stock), ("closing", close_stock))
+    }
+    rows = []
+    for i, category in enumerate(groups):
+        average = (sums["opening"][i] + sums["closing"][i]) / 2
+        rows.append({
+            "category": category,
+            "issued_qty": int(sums["issued"][i]),
+            "opening_stock": int(sums["opening"][i]),
+            "closing_stock": int(sums["closing"][i]),
+            "average_stock": round(float(average), 2),
+            "turnover": round(float(sums["issued"][i] / average), 3) if average > 0 else None,
+        })
+    return rows
+
+
+def ageing_report(db: Session, as_of: datetime.datetime = None) -> list:
+    """
+    Current stock per category split by age since receipt, from the live stock lots
+    (what FIFO / FEFO allocation actually left on the shelves). Stock not backed by a
+    lot, e.g. from before lot tracking, is reported as unattributed.
+    """
+    as_of = as_of or models.get_ist_now()
+    lot = models.StockLot
+    statement = select(lot.material_id, lot.quantity_remaining, lot.received_at).where(
+        lot.quantity_remaining > literal_column("0"),
+        lot.received_at.isnot(None),
+    )
+    material_ids, remaining, received_at = _columns(db, statement, 3)
+    stock = dict(db.query(models.Material.id, models.Material.current_stock))
+    categories = _categories(db)
+
+    totals = {}
+    if len(material_ids):
+        remaining = remaining.astype(np.float64)
+        age_days = (np.datetime64(as_of, "us") - received_at.astype("datetime64[us]")).astype("timedelta64[D]").astype(np.int64)
+        bucket = np.digitize(age_days, AGEING_BUCKETS, right=True)
+        labels = np.array([categories.get(int(m), UNCATEGORISED) for m in material_ids], dtype=object)
+        groups, inverse = np.unique(labels, return_inverse=True)
+        matrix = np.zeros((len(groups), len(AGEING_LABELS)))
+        np.add.at(matrix, (inverse, bucket), remaining)
+        for category, row in zip(groups, matrix):
+            totals[category] = row
+
+    rows = []
+    for category in sorted(set(categories.values()) | set(totals)):
+        row = totals.get(category, np.zeros(len(AGEING_LABELS)))
+        category_stock = sum(max(stock.get(m, 0) or 0, 0) for m, c in categories.items() if c == category)
+        rows.append({
+            "category": category,
+            "stock": int(category_stock),
+            "buckets": {label: int(value) for label, value in zip(AGEING_LABELS, row)},
+            "unattributed": int(category_stock - row.sum()),
+        })
+    return rows
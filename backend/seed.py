@@ -1,8 +1,19 @@
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from backend import models, auth, crud
+from backend import models
+from backend.hashing import password_pool
 from backend.models import UserRole
 
+# Bump whenever default_users changes so existing databases get re-seeded once
+SEED_VERSION = "1"
+SEED_MARKER_KEY = "default_users_seed_version"
+
 def seed_default_users(db: Session):
+    # Warm databases: one primary-key lookup and we're done
+    marker = db.get(models.AppMetadata, SEED_MARKER_KEY)
+    if marker and marker.value == SEED_VERSION:
+        return
+
     # Dictionary of default users: username -> (password, role)
     default_users = {
         "admin": ("admin123", UserRole.ADMIN),
@@ -13,17 +24,30 @@ def seed_default_users(db: Session):
         "Nikhil": ("off123", UserRole.OFFICER)
     }
 
-    for username, (password, role) in default_users.items():
-        user = db.query(models.User).filter(models.User.username == username).first()
-        if not user:
-            print(f"Seeding user: {username}")
-            hashed_pwd = crud.get_password_hash(password)
-            new_user = models.User(
-                username=username,
-                hashed_password=hashed_pwd,
-                role=role,
-                is_active=True
-            )
-            db.add(new_user)
-    
-    db.commit()
+    existing = {
+        username for (username,) in
+        db.query(models.User.username).filter(models.User.username.in_(default_users.keys()))
+    }
+    missing = [username for username in default_users if username not in existing]
+
+    # Hash all missing passwords in parallel on the bcrypt pool
+    hashed = password_pool.hash_many(default_users[username][0] for username in missing)
+    for username, hashed_pwd in zip(missing, hashed):
+        print(f"Seeding user: {username}")
+        db.add(models.User(
+            username=username,
+            hashed_password=hashed_pwd,
+            role=default_users[username][1],
+            is_active=True
+        ))
+
+    if marker:
+        marker.value = SEED_VERSION
+    else:
+        db.add(models.AppMetadata(key=SEED_MARKER_KEY, value=SEED_VERSION))
+
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another worker seeded concurrently
+        db.rollback()
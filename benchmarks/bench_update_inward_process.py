@@ -0,0 +1,111 @@
+"""
+Benchmark for crud.update_inward_process (PUT /officer/{entry_id}/verification-details).
+
+Compares the old per-item lookup loop against the current batched implementation
+at 10, 100 and 1000 items, reporting wall time and the number of SQL statements.
+
+Always runs on a temporary SQLite database, never the configured DATABASE_URL.
+
+Usage:
+    python -m benchmarks.bench_update_inward_process
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmpdir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/bench.db"
+
+from sqlalchemy import event
+
+from backend import crud, models, schemas
+from backend.database import SessionLocal, engine
+
+SIZES = (10, 100, 1000)
+ROUNDS = 5
+
+
+def legacy_update_inward_process(db, entry_id, update_data):
+    """The pre-batching implementation: one SELECT per updated item."""
+    entry = db.query(models.GateEntry).filter(models.GateEntry.id == entry_id).first()
+    inward = entry.inward_process
+    for item_update in update_data.items:
+        item = db.query(models.InwardItem).filter(
+            models.InwardItem.id == item_update.id,
+            models.InwardItem.inward_process_id == inward.id
+        ).first()
+        if item:
+            for field in crud.INWARD_ITEM_EDITABLE_FIELDS:
+                value = getattr(item_update, field)
+                if value is not None:
+                    setattr(item, field, value)
+    db.commit()
+    return entry
+
+
+def seed_entry(db, n_items):
+    entry = models.GateEntry(gate_pass_number=f"GP-BENCH-{n_items}", vendor_name="Bench", status="PENDING_OFFICER_FINAL_APPROVAL")
+    db.add(entry)
+    db.flush()
+    inward = models.InwardProcess(gate_entry_id=entry.id, invoice_no="INV")
+    db.add(inward)
+    db.flush()
+    db.add_all([
+        models.InwardItem(inward_process_id=inward.id, quantity_received=1, rack_no="R0")
+        for _ in range(n_items)
+    ])
+    db.commit()
+    item_ids = [item.id for item in inward.items]
+    return entry.id, item_ids
+
+
+def run(fn, entry_id, item_ids, round_no):
+    payload = schemas.InwardProcessUpdate(items=[
+        schemas.InwardItemUpdate(id=item_id, quantity_received=round_no + 2, rack_no=f"R{round_no + 1}")
+        for item_id in item_ids
+    ])
+    statements = 0
+
+    def count(*args):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        fn(db, entry_id, payload)
+        elapsed = time.perf_counter() - started
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", count)
+    return elapsed, statements
+
+
+def main():
+    models.Base.metadata.create_all(bind=engine)
+    print(f"{'items':>6} | {'legacy ms':>10} {'stmts':>6} | {'batched ms':>10} {'stmts':>6} | speedup")
+    print("-" * 62)
+    for n_items in SIZES:
+        db = SessionLocal()
+        entry_id, item_ids = seed_entry(db, n_items)
+        db.close()
+
+        results = {}
+        for name, fn in (("legacy", legacy_update_inward_process), ("batched", crud.update_inward_process)):
+            timings = []
+            for round_no in range(ROUNDS):
+                elapsed, statements = run(fn, entry_id, item_ids, round_no + (ROUNDS if name == "batched" else 0))
+                timings.append(elapsed)
+            results[name] = (min(timings) * 1000, statements)
+
+        legacy_ms, legacy_stmts = results["legacy"]
+        batched_ms, batched_stmts = results["batched"]
+        print(f"{n_items:>6} | {legacy_ms:>10.2f} {legacy_stmts:>6} | {batched_ms:>10.2f} {batched_stmts:>6} | {legacy_ms / batched_ms:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Multi-process contention check for crud.approve_issue.
+
+Several processes (standing in for uvicorn workers) race to approve the same pool of
+issues against a single material whose stock cannot cover all of them. Afterwards
+the script checks there were no lost updates, no oversell and no double approvals.
+tests/test_approve_issue_contention.py runs the same race on a smaller pool.
+
+Usage:
+    python -m benchmarks.contention_approve_issue [--workers 8] [--issues 400]
+    python -m benchmarks.contention_approve_issue --database-url postgresql://... --destroy
+
+The benchmark drops every table of the database it runs on; see benchmarks/scratch_db.py.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import scratch_db
+
+
+def create_issues(n_issues, stock):
+    """One material holding `stock` and `n_issues` pending issues of 1-3 units against it"""
+    from backend import models
+    from backend.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        material = models.Material(code=f"CONTENDED-{n_issues}-{stock}", name="Contended", category="SPARE",
+                                   unit="Nos", current_stock=stock)
+        db.add(material)
+        db.flush()
+        issues = [
+            models.MaterialIssue(
+                material_id=material.id, quantity_requested=(i % 3) + 1, purpose="contention",
+                requesting_dept="contention", officer_id=1, requested_by_id=1, status="PENDING_OFFICER_APPROVAL"
+            )
+            for i in range(n_issues)
+        ]
+        db.add_all(issues)
+        db.commit()
+        return material.id, [issue.id for issue in issues]
+    finally:
+        db.close()
+
+
+def worker(worker_no, issue_ids, results):
+    from backend import crud
+    from backend.database import engine, SessionLocal
+
+    engine.dispose()  # never share pooled connections across fork
+    order = list(issue_ids)
+    random.Random(worker_no).shuffle(order)  # every worker attempts every issue
+    approved = []
+    db = SessionLocal()
+    try:
+        for issue_id in order:
+            if crud.approve_issue(db, issue_id, officer_id=worker_no + 1):
+                approved.append(issue_id)
+    finally:
+        db.close()
+    results.put(approved)
+
+
+def race(n_workers, issue_ids, context=multiprocessing):
+    """Run `n_workers` worker processes over the same issues; returns every approval they reported"""
+    from backend.database import engine
+
+    engine.dispose()
+    results = context.Queue()
+    procs = [context.Process(target=worker, args=(n, issue_ids, results)) for n in range(n_workers)]
+    for proc in procs:
+        proc.start()
+    approved = [issue_id for _ in procs for issue_id in results.get(timeout=300)]
+    for proc in procs:
+        proc.join(timeout=30)
+        if proc.exitcode != 0:
+            raise RuntimeError(f"worker {proc.pid} exited with {proc.exitcode}")
+    return approved
+
+
+def check(material_id, issue_ids, stock, approved):
+    """Everything wrong with the database after a race; empty when nothing was lost or oversold"""
+    from backend import models
+    from backend.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        current_stock = db.query(models.Material.current_stock).filter(models.Material.id == material_id).scalar()
+        issues = db.query(models.MaterialIssue.id, models.MaterialIssue.status, models.MaterialIssue.quantity_requested).filter(
+            models.MaterialIssue.id.in_(issue_ids)
+        ).all()
+        logged = db.query(models.InventoryLog.change_quantity).filter(models.InventoryLog.material_id == material_id).all()
+    finally:
+        db.close()
+
+    quantities = {issue_id: quantity for issue_id, _, quantity in issues}
+    by_status = {}
+    for issue_id, status, _ in issues:
+        by_status.setdefault(status, []).append(issue_id)
+    pending = by_status.get("PENDING_OFFICER_APPROVAL", [])
+    issued = sum(quantities[issue_id] for issue_id in approved)
+
+    failures = []
+    if len(approved) != len(set(approved)):
+        failures.append("an issue was approved by more than one worker")
+    if sorted(approved) != sorted(by_status.get("APPROVED", [])):
+        failures.append("approvals reported by workers do not match the database")
+    if current_stock != stock - issued:
+        failures.append(f"lost update: stock {current_stock} != {stock} - {issued}")
+    if current_stock < 0:
+        failures.append(f"oversold: stock is {current_stock}")
+    # Contention never rejects: what was not approved is still pending, and only because stock ran out
+    if set(by_status) - {"APPROVED", "PENDING_OFFICER_APPROVAL"}:
+        failures.append(f"unexpected statuses: {sorted(set(by_status) - {'APPROVED', 'PENDING_OFFICER_APPROVAL'})}")
+    if any(quantities[issue_id] <= current_stock for issue_id in pending):
+        failures.append("an issue was left pending although stock covered it")
+    if sorted(change for (change,) in logged) != sorted(-quantities[issue_id] for issue_id in approved):
+        failures.append("inventory log does not match approvals")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--issues", type=int, default=400)
+    scratch_db.add_arguments(parser)
+    args = parser.parse_args()
+    scratch_db.select(args, "contention")
+
+    from backend import models
+    from backend.database import SessionLocal
+
+    scratch_db.recreate_schema()
+    # Stock covers roughly half of the requested quantity, so oversell would show
+    stock = args.issues
+    material_id, issue_ids = create_issues(args.issues, stock)
+
+    started = time.perf_counter()
+    approved = race(args.workers, issue_ids)
+    elapsed = time.perf_counter() - started
+    failures = check(material_id, issue_ids, stock, approved)
+
+    db = SessionLocal()
+    remaining = db.get(models.Material, material_id).current_stock
+    db.close()
+
+    attempts = args.workers * args.issues
+    print(f"workers={args.workers} issues={args.issues} attempts={attempts} elapsed={elapsed:.2f}s "
+          f"({attempts / elapsed:.0f} attempts/s)")
+    print(f"approved={len(approved)} issued={stock - remaining} remaining_stock={remaining}")
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+    print("OK: no lost updates, no oversell, no double approvals")
+
+
+if __name__ == "__main__":
+    main()
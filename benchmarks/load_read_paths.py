@@ -0,0 +1,185 @@
+"""
+Load test of the read-heavy list endpoints: sync handlers (threadpool + Session)
+versus ASYNC_DB=1 (async handlers + AsyncSession).
+
+For each mode a uvicorn server is started on a freshly seeded database and hit with
+a fixed number of concurrent clients cycling through the list endpoints. Reports
+throughput, latency percentiles and errors per mode and concurrency level.
+
+Usage:
+    python -m benchmarks.load_read_paths [--concurrency 16,64,256] [--requests 2000]
+    python -m benchmarks.load_read_paths --database-url postgresql://... --destroy
+
+The benchmark drops every table of the database it runs on; see benchmarks/scratch_db.py.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks import scratch_db
+
+ENDPOINTS = (
+    "/materials?limit=100",
+    "/store/items?limit=100",
+    "/store/issue-history?limit=50",
+    "/store/pending?limit=50",
+)
+
+
+def seed(n_materials, n_items, n_issues):
+    """Users, materials, store inventory rows and issues; returns the store manager's username"""
+    from sqlalchemy import insert
+
+    from backend import crud, models
+    from backend.database import SessionLocal, engine
+
+    scratch_db.recreate_schema()
+    db = SessionLocal()
+    manager = models.User(username="load-store", hashed_password="-", role=models.UserRole.STORE_MANAGER)
+    officer = models.User(username="load-officer", hashed_password="-", role=models.UserRole.OFFICER)
+    db.add_all([manager, officer])
+    db.flush()
+    db.execute(insert(models.Material), [
+        {"code": f"MAT-{i:05d}", "name": f"Material {i}", "category": "SPARE", "unit": "Nos",
+         "min_stock_level": 10, "current_stock": 100}
+        for i in range(n_materials)
+    ])
+    db.execute(insert(models.StoreInventory), [
+        {"id": i + 1, "officer_id": officer.id, "officer_name": officer.username, "material_id": (i % n_materials) + 1,
+         "material_name": f"Material {i % n_materials}", "material_code": f"MAT-{i % n_materials:05d}",
+         "category": "SPARE", "quantity": 5, "unit": "Nos", "store_room": "A", "rack_no": "1", "shelf_no": "2",
+         "inward_date": models.get_ist_now()}
+        for i in range(n_items)
+    ])
+    db.execute(insert(models.MaterialIssue), [
+        {"material_id": (i % n_materials) + 1, "quantity_requested": 1, "purpose": "load", "requesting_dept": "load",
+         "officer_id": officer.id, "requested_by_id": manager.id, "status": "PENDING_OFFICER_APPROVAL"}
+        for i in range(n_issues)
+    ])
+    db.add(models.AppMetadata(key=crud.STORE_INVENTORY_MARKER_KEY, value=str(n_items)))
+    username = manager.username
+    db.commit()
+    db.close()
+    engine.dispose()
+    return username
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(async_db: bool):
+    port = _free_port()
+    env = dict(os.environ, ASYNC_DB="1" if async_db else "0", BCRYPT_WORKERS="0")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+    )
+    return proc, f"http://127.0.0.1:{port}"
+
+
+async def wait_ready(client, base_url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(f"{base_url}/")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def run_load(client, base_url, headers, concurrency, total):
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def client_loop():
+        nonlocal errors
+        for n in counter:
+            path = ENDPOINTS[n % len(ENDPOINTS)]
+            started = time.perf_counter()
+            try:
+                response = await client.get(base_url + path, headers=headers)
+                if response.status_code != 200:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def bench_mode(async_db, levels, total, headers):
+    import httpx
+
+    proc, base_url = start_server(async_db)
+    results = []
+    try:
+        limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+        async with httpx.AsyncClient(limits=limits, timeout=60.0) as client:
+            await wait_ready(client, base_url)
+            await run_load(client, base_url, headers, 8, 200)  # warm-up
+            for concurrency in levels:
+                latencies, errors, elapsed = await run_load(client, base_url, headers, concurrency, total)
+                results.append({
+                    "concurrency": concurrency,
+                    "rps": total / elapsed,
+                    "p50": statistics.median(latencies),
+                    "p95": _percentile(latencies, 95),
+                    "p99": _percentile(latencies, 99),
+                    "errors": errors,
+                })
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", default="16,64,256", help="comma-separated client counts")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per concurrency level")
+    parser.add_argument("--materials", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--issues", type=int, default=2000)
+    scratch_db.add_arguments(parser)
+    args = parser.parse_args()
+    scratch_db.select(args, "load")
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    from backend import auth
+
+    username = seed(args.materials, args.items, args.issues)
+    headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': username})}"}
+
+    print(f"database={scratch_db.display(os.environ['DATABASE_URL'])} requests/level={args.requests}")
+    print(f"{'mode':<6} {'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    for async_db in (False, True):
+        mode = "async" if async_db else "sync"
+        for row in asyncio.run(bench_mode(async_db, levels, args.requests, headers)):
+            print(f"{mode:<6} {row['concurrency']:>7} {row['rps']:>8.0f} {row['p50']:>8.1f} "
+                  f"{row['p95']:>8.1f} {row['p99']:>8.1f} {row['errors']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Database selection for the benchmarks.
+
+The benchmarks drop and recreate every table before seeding, so they never run against
+the app's DATABASE_URL. The target is --database-url or BENCH_DATABASE_URL; without
+either a throwaway SQLite file is used. A database named explicitly is only wiped when
+--destroy is passed as well.
+"""
+import os
+import sys
+import tempfile
+
+from sqlalchemy.engine import make_url
+
+BENCH_DATABASE_URL_ENV = "BENCH_DATABASE_URL"
+
+_selected = None
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--database-url",
+        help=f"database to benchmark against (default: ${BENCH_DATABASE_URL_ENV}, else a temporary SQLite file)",
+    )
+    parser.add_argument(
+        "--destroy", action="store_true",
+        help="confirm that every table of --database-url / $BENCH_DATABASE_URL may be dropped",
+    )
+
+
+def select(args, name: str) -> str:
+    """Point backend.database at the benchmark database; must run before backend is imported"""
+    global _selected
+    if "backend.database" in sys.modules:
+        raise RuntimeError("backend.database was imported before the benchmark database was selected")
+    url = args.database_url or os.environ.get(BENCH_DATABASE_URL_ENV)
+    if url is None:
+        url = f"sqlite:///{tempfile.mkdtemp()}/{name}.db"
+    elif not args.destroy:
+        sys.exit(f"Refusing to drop every table in {display(url)}; pass --destroy if it is a scratch database")
+    os.environ["DATABASE_URL"] = _selected = url
+    return url
+
+
+def display(url: str) -> str:
+    return make_url(url).render_as_string(hide_password=True)
+
+
+def recreate_schema():
+    """Drop and recreate every table of the database chosen by select()"""
+    from backend import models
+    from backend.database import engine
+
+    if _selected is None or os.environ.get("DATABASE_URL") != _selected:
+        raise RuntimeError("recreate_schema() only runs on a database chosen by select()")
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
@@ -0,0 +1,335 @@
+"""
+End-to-end benchmark of the inward and issue workflows.
+
+Seeds a database with realistic volumes (materials, gate entries in every stage,
+inward items, issues and the matching inventory ledger), then drives complete flows
+through the app in-process with FastAPI's TestClient:
+
+    gate entry -> stage-1 approval -> store processing -> final approval -> issue request
+    -> issue approval, plus the list screens each role polls along the way.
+
+Reports p50/p95/p99 latency and throughput per endpoint and writes the results as JSON.
+Runs with the same parameters can be diffed across commits; --compare fails (exit 1)
+when an endpoint's p95 regressed by more than --max-regression percent.
+
+Usage:
+    python -m benchmarks.workflow_suite [--flows 200] [--concurrency 1] [--output results.json]
+    python -m benchmarks.workflow_suite --compare baseline.json --max-regression 20
+    python -m benchmarks.workflow_suite --database-url postgresql://... --destroy
+
+The suite drops every table of the database it runs on; see benchmarks/scratch_db.py.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks import scratch_db
+
+SEED_BATCH = 2000
+# Share of seeded gate entries left in each open stage; the rest are FINAL_APPROVED
+OPEN_STAGES = {
+    "PENDING_OFFICER_APPROVAL_1": 0.02,
+    "APPROVED_STAGE_1": 0.02,
+    "PENDING_OFFICER_FINAL_APPROVAL": 0.01,
+}
+
+
+def _bulk(db, model, rows):
+    from sqlalchemy import insert
+
+    for i in range(0, len(rows), SEED_BATCH):
+        db.execute(insert(model), rows[i:i + SEED_BATCH])
+
+
+def seed(n_materials, n_entries, items_per_entry, n_issues, rng):
+    """Bulk-load the database; stock and ledger balances are kept consistent"""
+    from backend import models, seed as default_seed
+    from backend.database import SessionLocal, engine
+
+    scratch_db.recreate_schema()
+    db = SessionLocal()
+    default_seed.seed_default_users(db)
+    users = {user.username: user.id for user in db.query(models.User)}
+    security, store, officer = users["security"], users["store"], users["officer"]
+
+    now = models.get_ist_now()
+    start = now - datetime.timedelta(days=365)
+
+    _bulk(db, models.Material, [
+        {"id": m, "code": f"MAT-{m:05d}", "name": f"Material {m}", "category": rng.choice(["SPARE", "CONSUMABLE", "MECHANICAL", "ELECTRICAL"]),
+         "unit": "Nos", "min_stock_level": rng.randint(5, 50), "current_stock": 0}
+        for m in range(1, n_materials + 1)
+    ])
+
+    entries, processes, items, movements = [], [], [], []
+    item_id = 0
+    for e in range(1, n_entries + 1):
+        roll = rng.random()
+        status = "FINAL_APPROVED"
+        for stage, share in OPEN_STAGES.items():
+            if roll < share:
+                status = stage
+                break
+            roll -= share
+        created = start + datetime.timedelta(seconds=rng.randint(0, 365 * 86400))
+        entries.append({"id": e, "gate_pass_number": f"GP-SEED-{e:07d}", "vendor_name": f"Vendor {e % 97}",
+                        "created_at": created, "created_by_id": security, "status": status, "request_officer_id": officer})
+        if status in ("PENDING_OFFICER_APPROVAL_1", "APPROVED_STAGE_1"):
+            continue
+        approved_at = created + datetime.timedelta(hours=rng.randint(1, 72)) if status == "FINAL_APPROVED" else None
+        processes.append({"id": e, "gate_entry_id": e, "invoice_no": f"INV-{e}", "invoice_date": created,
+                          "final_approved_by_id": officer if approved_at else None, "final_approved_at": approved_at})
+        for _ in range(items_per_entry):
+            item_id += 1
+            material_id = rng.randint(1, n_materials)
+            quantity = rng.randint(1, 100)
+            items.append({"id": item_id, "inward_process_id": e, "material_id": material_id, "quantity_received": quantity,
+                          "store_room": f"S{rng.randint(1, 4)}", "rack_no": f"R{rng.randint(1, 40)}", "shelf_no": f"{rng.randint(1, 8)}"})
+            if approved_at:
+                movements.append((approved_at, material_id, quantity, "INWARD", f"GP-SEED-{e:07d}"))
+
+    issues = []
+    for i in range(1, n_issues + 1):
+        material_id = rng.randint(1, n_materials)
+        created = start + datetime.timedelta(seconds=rng.randint(0, 365 * 86400))
+        approved = rng.random() < 0.8
+        issues.append({"id": i, "material_id": material_id, "quantity_requested": rng.randint(1, 10), "purpose": "seed",
+                       "requesting_dept": "Maintenance", "created_at": created, "officer_id": officer, "requested_by_id": store,
+                       "status": "APPROVED" if approved else "PENDING_OFFICER_APPROVAL",
+                       "approved_by_id": officer if approved else None,
+                       "approved_at": created + datetime.timedelta(hours=1) if approved else None,
+                       "issue_note_id": f"NOTE-SEED{i:07d}" if approved else None})
+        if approved:
+            movements.append((created + datetime.timedelta(hours=1), material_id, -issues[-1]["quantity_requested"], "ISSUE", f"ISS-{i}"))
+
+    # Ledger in time order; issues that would overdraw are simply not approved
+    stock = {}
+    logs = []
+    rejected = set()
+    for at, material_id, change, kind, reference in sorted(movements):
+        balance = stock.get(material_id, 0) + change
+        if balance < 0:
+            rejected.add(int(reference[4:]))
+            continue
+        stock[material_id] = balance
+        logs.append({"material_id": material_id, "change_quantity": change, "balance_after": balance,
+                     "transaction_type": kind, "reference_id": reference, "created_at": at,
+                     "created_by_id": officer})
+    for issue in issues:
+        if issue["id"] in rejected:
+            issue.update(status="PENDING_OFFICER_APPROVAL", approved_by_id=None, approved_at=None, issue_note_id=None)
+
+    _bulk(db, models.GateEntry, entries)
+    _bulk(db, models.InwardProcess, processes)
+    _bulk(db, models.InwardItem, items)
+    _bulk(db, models.MaterialIssue, issues)
+    _bulk(db, models.InventoryLog, logs)
+    from sqlalchemy import bindparam, text, update
+
+    materials = models.Material.__table__
+    db.execute(update(materials).where(materials.c.id == bindparam("b_id")).values(current_stock=bindparam("b_stock")),
+               [{"b_id": material_id, "b_stock": balance} for material_id, balance in stock.items()])
+    if db.get_bind().dialect.name == "postgresql":
+        # Explicit ids bypassed the sequences; move them past the seeded rows
+        for model in (models.Material, models.GateEntry, models.InwardProcess, models.InwardItem, models.MaterialIssue):
+            table = model.__tablename__
+            db.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"))
+    db.commit()
+    db.close()
+    engine.dispose()
+    return {"materials": n_materials, "gate_entries": n_entries, "inward_items": len(items),
+            "issues": n_issues, "inventory_logs": len(logs)}
+
+
+class Recorder:
+    """Latencies per endpoint (method + route template)"""
+
+    _ID = re.compile(r"/\d+(?=/|$)")
+
+    def __init__(self, client):
+        self.client = client
+        self.samples = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def call(self, method, url, expect=200, **kwargs):
+        name = f"{method.upper()} {self._ID.sub('/{id}', url.split('?')[0])}"
+        started = time.perf_counter()
+        response = self.client.request(method, url, **kwargs)
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.samples.setdefault(name, []).append(elapsed)
+            if response.status_code != expect:
+                self.errors[name] = self.errors.get(name, 0) + 1
+        return response
+
+
+def run_flow(rec, headers, officer_id, material_ids, rng):
+    """One gate entry through to an approved issue, polling the list screens on the way"""
+    sec, off, st = headers["security"], headers["officer"], headers["store"]
+
+    entry = rec.call("post", "/gate-entry/", headers=sec, json={
+        "vendor_name": "Bench Vendor", "vehicle_number": "KA-01-1234", "request_officer_id": officer_id,
+    }).json()
+    rec.call("get", "/officer/pending-stage-1?limit=50", headers=off)
+    rec.call("post", f"/gate-entry/{entry['id']}/approve-stage-1", headers=off, json={"action": "APPROVED"})
+    rec.call("get", "/store/pending?limit=50", headers=st)
+
+    lines = [
+        {"material_id": rng.choice(material_ids), "quantity_received": rng.randint(5, 50),
+         "store_room": "S1", "rack_no": f"R{rng.randint(1, 40)}", "shelf_no": "1"}
+        for _ in range(rng.randint(2, 8))
+    ]
+    rec.call("post", f"/store/{entry['id']}/process", headers=st, json={
+        "invoice_no": f"INV-B{entry['id']}", "invoice_date": "2024-01-01T00:00:00", "items": lines,
+    })
+    rec.call("get", "/officer/final-pending", headers=off)
+    rec.call("post", f"/officer/{entry['id']}/final-approve", headers=off)
+
+    rec.call("get", "/store/items?limit=100", headers=st)
+    rec.call("get", "/materials?limit=100", headers=st)
+    issue = rec.call("post", "/issue/request", headers=st, json={
+        "material_id": lines[0]["material_id"], "quantity_requested": rng.randint(1, 5),
+        "purpose": "bench", "requesting_dept": "Maintenance", "officer_id": officer_id,
+    }).json()
+    rec.call("get", "/officer/pending-issues", headers=off)
+    rec.call("post", f"/officer/issue/{issue['id']}/approve", headers=off)
+    rec.call("get", "/officer/approved-issues?limit=50", headers=off)
+    rec.call("get", "/store/issue-history?limit=50", headers=st)
+
+
+def _percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarise(rec, wall_seconds):
+    endpoints = {}
+    for name, samples in sorted(rec.samples.items()):
+        ordered = sorted(samples)
+        endpoints[name] = {
+            "count": len(samples),
+            "errors": rec.errors.get(name, 0),
+            "mean_ms": round(statistics.fmean(samples), 3),
+            "p50_ms": round(_percentile(ordered, 50), 3),
+            "p95_ms": round(_percentile(ordered, 95), 3),
+            "p99_ms": round(_percentile(ordered, 99), 3),
+            # Requests per second of time spent serving this endpoint
+            "throughput_rps": round(len(samples) / (sum(samples) / 1000), 1),
+        }
+    total = sum(len(samples) for samples in rec.samples.values())
+    return endpoints, {"requests": total, "wall_seconds": round(wall_seconds, 3), "throughput_rps": round(total / wall_seconds, 1)}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline_path, results, max_regression):
+    """Print per-endpoint p95 deltas; returns the endpoints that regressed beyond the limit"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = []
+    print(f"\nvs {baseline_path} (commit {baseline.get('commit')}):")
+    if baseline.get("params") != results["params"] or baseline.get("database") != results["database"]:
+        print("  WARNING: baseline was run with different parameters; latencies are not comparable")
+    for name, stats in results["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if not before:
+            print(f"  {name:<45} new")
+            continue
+        delta = (stats["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0.0
+        flag = "  REGRESSION" if delta > max_regression else ""
+        print(f"  {name:<45} p95 {before['p95_ms']:>8.2f} -> {stats['p95_ms']:>8.2f} ms ({delta:+6.1f}%){flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--flows", type=int, default=200, help="complete gate-to-issue flows to drive")
+    parser.add_argument("--concurrency", type=int, default=1, help="flows in flight at once (client threads)")
+    parser.add_argument("--materials", type=int, default=500)
+    parser.add_argument("--gate-entries", type=int, default=5000)
+    parser.add_argument("--items-per-entry", type=int, default=4)
+    parser.add_argument("--issues", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="workflow_results.json")
+    parser.add_argument("--compare", help="previous results JSON to diff against")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="allowed p95 increase in percent")
+    scratch_db.add_arguments(parser)
+    args = parser.parse_args()
+    scratch_db.select(args, "workflow")
+
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    volumes = seed(args.materials, args.gate_entries, args.items_per_entry, args.issues, rng)
+    print(f"Seeded {volumes} in {time.perf_counter() - started:.1f}s")
+
+    from fastapi.testclient import TestClient
+
+    from backend.main import app
+
+    with TestClient(app, raise_server_exceptions=False) as client:
+        headers = {}
+        for username, password in (("security", "sec123"), ("officer", "off123"), ("store", "store123")):
+            token = client.post("/token", data={"username": username, "password": password}).json()["access_token"]
+            headers[username] = {"Authorization": f"Bearer {token}"}
+        officer_id = client.get("/users/me", headers=headers["officer"]).json()["id"]
+        material_ids = list(range(1, args.materials + 1))
+
+        rec = Recorder(client)
+        rngs = [random.Random(args.seed + n) for n in range(args.flows)]
+        started = time.perf_counter()
+        if args.concurrency > 1:
+            with ThreadPoolExecutor(args.concurrency) as pool:
+                list(pool.map(lambda r: run_flow(rec, headers, officer_id, material_ids, r), rngs))
+        else:
+            for flow_rng in rngs:
+                run_flow(rec, headers, officer_id, material_ids, flow_rng)
+        wall = time.perf_counter() - started
+
+    endpoints, totals = summarise(rec, wall)
+    results = {
+        "commit": _git_commit(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "database": os.environ["DATABASE_URL"].split("://")[0],
+        "params": {"flows": args.flows, "concurrency": args.concurrency, "seed": args.seed, **volumes},
+        "totals": totals,
+        "endpoints": endpoints,
+    }
+
+    print(f"\n{'endpoint':<45} {'n':>5} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+    for name, stats in endpoints.items():
+        print(f"{name:<45} {stats['count']:>5} {stats['errors']:>4} {stats['p50_ms']:>8.2f} "
+              f"{stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} {stats['throughput_rps']:>8.1f}")
+    print(f"\n{totals['requests']} requests in {totals['wall_seconds']}s ({totals['throughput_rps']} req/s overall)")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"Results written to {args.output}")
+
+    failed = sum(stats["errors"] for stats in endpoints.values()) > 0
+    if args.compare and compare(args.compare, results, args.max_regression):
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -21,4 +21,13 @@ api.interceptors.request.use(
     }
 )
 
+// List endpoints return one page at a time (100 rows unless ?limit= is given); when more
+// rows follow, the cursor for the next page comes back in the X-Next-Cursor header
+export const getPage = async (url, params = {}, cursor = null) => {
+    const query = Object.fromEntries(Object.entries(params).filter(([, value]) => value !== '' && value != null))
+    if (cursor) query.cursor = cursor
+    const res = await api.get(url, { params: query })
+    return { rows: res.data, nextCursor: res.headers['x-next-cursor'] || null }
+}
+
 export default api
@@ -0,0 +1,37 @@
+import { useRef, useState } from 'react'
+import { getPage } from './axios'
+
+// One paginated list: load() fetches its first page, loadMore() appends the next one
+const usePagedList = () => {
+    const [rows, setRows] = useState([])
+    const [nextCursor, setNextCursor] = useState(null)
+    const [loading, setLoading] = useState(false)
+    const lastRequest = useRef({ url: null, params: {}, seq: 0 })
+
+    const fetchPage = async (url, params, cursor) => {
+        const seq = ++lastRequest.current.seq
+        lastRequest.current = { url, params, seq }
+        setLoading(true)
+        try {
+            const page = await getPage(url, params, cursor)
+            if (seq !== lastRequest.current.seq) return // a newer load() superseded this one
+            setRows(prev => cursor ? [...prev, ...page.rows] : page.rows)
+            setNextCursor(page.nextCursor)
+        } catch (e) {
+            console.error("Failed to fetch", e)
+        } finally {
+            if (seq === lastRequest.current.seq) setLoading(false)
+        }
+    }
+
+    const load = (url, params = {}) => fetchPage(url, params, null)
+
+    const loadMore = () => {
+        const { url, params } = lastRequest.current
+        if (url && nextCursor) return fetchPage(url, params, nextCursor)
+    }
+
+    return { rows, nextCursor, loading, load, loadMore }
+}
+
+export default usePagedList
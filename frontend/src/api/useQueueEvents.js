@@ -0,0 +1,77 @@
+import { useEffect, useRef } from 'react'
+import api from './axios'
+
+// Queues pushed by /events/stream; each SSE message is named after the queue that changed
+const QUEUES = [
+    'pending-stage-1', 'store-pending', 'final-pending', 'pending-issues', 'approved-issues',
+    'issue-history', 'store-items', 'materials', 'gate-entries',
+]
+const RECONNECT_MS = 5000
+// One approval emits an event per row it touches, so changes are handed over in batches
+const BATCH_MS = 250
+
+// Calls onChange(queues) with the Set of queues that changed; 'resync' is in the set when
+// events may have been missed (the server dropped some, or the stream reconnected)
+const useQueueEvents = (onChange) => {
+    const handler = useRef(onChange)
+    handler.current = onChange
+
+    useEffect(() => {
+        let source = null
+        let reconnectTimer = null
+        let batchTimer = null
+        let changed = new Set()
+        let connectedBefore = false
+        let closed = false
+
+        const queue = (name) => {
+            changed.add(name)
+            if (batchTimer) return
+            batchTimer = setTimeout(() => {
+                const queues = changed
+                changed = new Set()
+                batchTimer = null
+                handler.current(queues)
+            }, BATCH_MS)
+        }
+
+        const reconnect = () => {
+            if (!closed) reconnectTimer = setTimeout(connect, RECONNECT_MS)
+        }
+
+        const connect = async () => {
+            try {
+                // Stream tokens expire after a minute, so every (re)connect fetches a fresh
+                // one instead of letting EventSource retry with the old URL
+                const res = await api.post('/events/stream-token')
+                if (closed) return
+                const base = (import.meta.env.VITE_API_URL || '').replace(/\/$/, '')
+                source = new EventSource(`${base}/events/stream?token=${encodeURIComponent(res.data.token)}`)
+                source.onopen = () => {
+                    if (connectedBefore) queue('resync')
+                    connectedBefore = true
+                }
+                QUEUES.forEach(name => source.addEventListener(name, () => queue(name)))
+                source.addEventListener('resync', () => queue('resync'))
+                source.onerror = () => {
+                    source.close()
+                    source = null
+                    reconnect()
+                }
+            } catch (e) {
+                console.error("Failed to open the event stream", e)
+                reconnect()
+            }
+        }
+
+        connect()
+        return () => {
+            closed = true
+            clearTimeout(reconnectTimer)
+            clearTimeout(batchTimer)
+            if (source) source.close()
+        }
+    }, [])
+}
+
+export default useQueueEvents
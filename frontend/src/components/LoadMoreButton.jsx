@@ -0,0 +1,13 @@
+const LoadMoreButton = ({ list }) => {
+    if (!list.nextCursor) return null
+
+    return (
+        <div style={{ textAlign: 'center', marginTop: '1rem' }}>
+            <button className="btn btn-secondary" disabled={list.loading} onClick={list.loadMore}>
+                {list.loading ? 'Loading...' : 'Load more'}
+            </button>
+        </div>
+    )
+}
+
+export default LoadMoreButton
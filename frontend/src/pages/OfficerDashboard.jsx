@@ -1,15 +1,21 @@
 import { useState, useEffect } from 'react'
 import DashboardLayout from '../components/DashboardLayout'
 import api from '../api/axios'
+import usePagedList from '../api/usePagedList'
+import useQueueEvents from '../api/useQueueEvents'
 import { CheckCircle, XCircle } from 'lucide-react'
 import StoreInventoryTable from '../components/StoreInventoryTable'
+import LoadMoreButton from '../components/LoadMoreButton'
 
 const OfficerDashboard = () => {
     const [activeTab, setActiveTab] = useState('stage1') // stage1, final, issues, inventory, materials
-    const [items, setItems] = useState([])
-    const [storeItems, setStoreItems] = useState([]) // For personal inventory view
-    const [materials, setMaterials] = useState([]) // For material management
-    const [loading, setLoading] = useState(true)
+    const itemList = usePagedList() // Queue of the active approval tab
+    const storeItemList = usePagedList() // For personal inventory view
+    const materialList = usePagedList() // For material management
+    const items = itemList.rows
+    const storeItems = storeItemList.rows
+    const materials = materialList.rows
+    const loading = itemList.loading || storeItemList.loading || materialList.loading
 
     // Material creation form state
     const [materialForm, setMaterialForm] = useState({
@@ -25,48 +31,40 @@ const OfficerDashboard = () => {
     const [materialSearch, setMaterialSearch] = useState('')
     const [materialCategoryFilter, setMaterialCategoryFilter] = useState('')
 
-    const filteredMaterials = materials.filter(m => {
-        const matchesSearch = m.name.toLowerCase().includes(materialSearch.toLowerCase()) ||
-            m.code.toLowerCase().includes(materialSearch.toLowerCase())
-        const matchesCategory = materialCategoryFilter ? m.category === materialCategoryFilter : true
-        return matchesSearch && matchesCategory
-    })
-
-    const fetchItems = async () => {
-        setLoading(true)
-        try {
-            let endpoint = '/officer/pending-stage-1'
-            if (activeTab === 'final') endpoint = '/officer/final-pending'
-            if (activeTab === 'issues') endpoint = '/officer/pending-issues'
-            if (activeTab === 'approved_issues') endpoint = '/officer/approved-issues'
-
-            if (activeTab === 'inventory') {
-                const res = await api.get('/store/items')
-                setStoreItems(res.data)
-                setLoading(false)
-                return
-            }
-
-            if (activeTab === 'materials') {
-                const res = await api.get('/materials')
-                setMaterials(res.data)
-                setLoading(false)
-                return
-            }
-
-            const res = await api.get(endpoint)
-            setItems(res.data)
-        } catch (error) {
-            console.error("Failed to fetch", error)
-        } finally {
-            setLoading(false)
+    const fetchItems = () => {
+        // First page of the active tab's list; "Load more" fetches the rest on demand
+        if (activeTab === 'inventory') return storeItemList.load('/store/items')
+        if (activeTab === 'materials') {
+            return materialList.load('/materials', { search: materialSearch, category: materialCategoryFilter })
         }
+
+        let endpoint = '/officer/pending-stage-1'
+        if (activeTab === 'final') endpoint = '/officer/final-pending'
+        if (activeTab === 'issues') endpoint = '/officer/pending-issues'
+        if (activeTab === 'approved_issues') endpoint = '/officer/approved-issues'
+        return itemList.load(endpoint)
     }
 
     useEffect(() => {
         fetchItems()
     }, [activeTab])
 
+    // Material search runs on the server, so matches beyond the first page are found too
+    useEffect(() => {
+        if (activeTab !== 'materials') return
+        const timer = setTimeout(fetchItems, 300)
+        return () => clearTimeout(timer)
+    }, [materialSearch, materialCategoryFilter])
+
+    // Refetch the open tab when the server reports a change to its queue
+    const TAB_QUEUES = {
+        stage1: 'pending-stage-1', final: 'final-pending', issues: 'pending-issues',
+        approved_issues: 'approved-issues', inventory: 'store-items', materials: 'materials',
+    }
+    useQueueEvents((queues) => {
+        if (queues.has('resync') || queues.has(TAB_QUEUES[activeTab])) fetchItems()
+    })
+
     const handleAction = async (id, action, type = 'stage1') => {
         if (!confirm(`Are you sure you want to ${action}?`)) return
 
@@ -329,15 +327,15 @@ const OfficerDashboard = () => {
                             </div>
                         </div>
 
-                        {loading ? (
+                        {loading && materials.length === 0 ? (
                             <p>Loading...</p>
-                        ) : materials.length === 0 ? (
+                        ) : materials.length === 0 && (materialSearch || materialCategoryFilter) ? (
                             <div style={{ padding: '2rem', textAlign: 'center', color: 'var(--text-muted)' }}>
-                                No materials created yet. Create your first material above.
+                                No materials match your search.
                             </div>
-                        ) : filteredMaterials.length === 0 ? (
+                        ) : materials.length === 0 ? (
                             <div style={{ padding: '2rem', textAlign: 'center', color: 'var(--text-muted)' }}>
-                                No materials match your search.
+                                No materials created yet. Create your first material above.
                             </div>
                         ) : (
                             <table>
@@ -353,7 +351,7 @@ const OfficerDashboard = () => {
                                     </tr>
                                 </thead>
                                 <tbody>
-                                    {filteredMaterials.map(m => {
+                                    {materials.map(m => {
                                         const deviation = m.min_stock_level > 0
                                             ? ((m.current_stock - m.min_stock_level) / m.min_stock_level) * 100
                                             : 0;
@@ -381,9 +379,13 @@ const OfficerDashboard = () => {
                                 </tbody>
                             </table>
                         )}
+                        <LoadMoreButton list={materialList} />
                     </>
                 ) : activeTab === 'inventory' ? (
-                    <StoreInventoryTable items={storeItems} userRole="OFFICER" />
+                    <>
+                        <StoreInventoryTable items={storeItems} userRole="OFFICER" />
+                        <LoadMoreButton list={storeItemList} />
+                    </>
                 ) : activeTab === 'final' ? (
                     <>
                         {items.length === 0 && !loading && (
@@ -750,6 +752,7 @@ const OfficerDashboard = () => {
                                 </tbody>
                             </table>
                         )}
+                        <LoadMoreButton list={itemList} />
                     </>
                 )}
             </div >
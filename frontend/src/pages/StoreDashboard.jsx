@@ -1,16 +1,22 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import DashboardLayout from '../components/DashboardLayout'
 import api from '../api/axios'
+import usePagedList from '../api/usePagedList'
+import useQueueEvents from '../api/useQueueEvents'
 import StoreInventoryTable from '../components/StoreInventoryTable'
+import LoadMoreButton from '../components/LoadMoreButton'
 
 const StoreDashboard = () => {
     const [activeTab, setActiveTab] = useState('verification') // verification, inventory, master, issue
-    const [items, setItems] = useState([]) // For pending verification
-    const [materials, setMaterials] = useState([]) // For inventory
-    const [storeItems, setStoreItems] = useState([]) // For live inventory
-    const [issueRecords, setIssueRecords] = useState([]) // For issue history
+    const pendingList = usePagedList() // For pending verification
+    const materialList = usePagedList() // For inventory
+    const storeItemList = usePagedList() // For live inventory
+    const issueRecordList = usePagedList() // For issue history
+    const items = pendingList.rows
+    const materials = materialList.rows
+    const storeItems = storeItemList.rows
+    const issueRecords = issueRecordList.rows
     const [officers, setOfficers] = useState([]) // For officer selection
-    const [loading, setLoading] = useState(false)
     const [selectedItem, setSelectedItem] = useState(null) // For verification modal/form
 
     // Form states
@@ -44,46 +50,21 @@ const StoreDashboard = () => {
     const [catalogSearch, setCatalogSearch] = useState('')
     const [catalogCategoryFilter, setCatalogCategoryFilter] = useState('')
 
-    const filteredMaterials = materials.filter(m => {
-        const matchesSearch = m.name.toLowerCase().includes(materialSearch.toLowerCase()) ||
-            m.code.toLowerCase().includes(materialSearch.toLowerCase())
-        const matchesCategory = issueCategory ? m.category === issueCategory : true
-        return matchesSearch && matchesCategory
-    })
-
-    const filteredCatalog = materials.filter(m => {
-        const matchesSearch = m.name.toLowerCase().includes(catalogSearch.toLowerCase()) ||
-            m.code.toLowerCase().includes(catalogSearch.toLowerCase())
-        const matchesCategory = catalogCategoryFilter ? m.category === catalogCategoryFilter : true
-        return matchesSearch && matchesCategory
-    })
-
-    const fetchPending = async () => {
-        setLoading(true)
-        try {
-            const res = await api.get('/store/pending')
-            setItems(res.data)
-        } catch (e) { console.error(e) }
-        setLoading(false)
-    }
+    // Lists load their first page; "Load more" fetches the rest on demand
+    const fetchPending = () => pendingList.load('/store/pending')
 
-    const fetchMaterials = async () => {
-        setLoading(true)
-        try {
-            const res = await api.get('/materials')
-            setMaterials(res.data)
-        } catch (e) { console.error(e) }
-        setLoading(false)
+    // Material search runs on the server, so matches beyond the first page are found too
+    const fetchMaterials = () => {
+        if (activeTab === 'master') {
+            return materialList.load('/materials', { search: catalogSearch, category: catalogCategoryFilter })
+        }
+        if (activeTab === 'issue') {
+            return materialList.load('/materials', { search: materialSearch, category: issueCategory })
+        }
+        return materialList.load('/materials', { search: materialSearch })
     }
 
-    const fetchStoreItems = async () => {
-        setLoading(true)
-        try {
-            const res = await api.get('/store/items')
-            setStoreItems(res.data)
-        } catch (e) { console.error(e) }
-        setLoading(false)
-    }
+    const fetchStoreItems = () => storeItemList.load('/store/items')
 
     const fetchOfficers = async () => {
         try {
@@ -96,14 +77,7 @@ const StoreDashboard = () => {
         } catch (e) { console.error(e) }
     }
 
-    const fetchIssueHistory = async () => {
-        setLoading(true)
-        try {
-            const res = await api.get('/store/issue-history')
-            setIssueRecords(res.data)
-        } catch (e) { console.error(e) }
-        setLoading(false)
-    }
+    const fetchIssueHistory = () => issueRecordList.load('/store/issue-history')
 
     const downloadReceipt = async (issueId) => {
         try {
@@ -131,10 +105,12 @@ const StoreDashboard = () => {
             fetchPending()
             fetchMaterials()
         }
-        if (activeTab === 'inventory' || activeTab === 'master') {
-            fetchMaterials()
+        if (activeTab === 'inventory') {
             fetchStoreItems()
         }
+        if (activeTab === 'master') {
+            fetchMaterials()
+        }
         if (activeTab === 'issue') {
             fetchMaterials()
             fetchOfficers()
@@ -144,6 +120,29 @@ const StoreDashboard = () => {
         }
     }, [activeTab])
 
+    // Re-run the material search as the user types (the tab effect above does the first load)
+    const searchTyped = useRef(false)
+    useEffect(() => {
+        if (!searchTyped.current) {
+            searchTyped.current = true
+            return
+        }
+        if (!['verification', 'master', 'issue'].includes(activeTab)) return
+        const timer = setTimeout(fetchMaterials, 300)
+        return () => clearTimeout(timer)
+    }, [materialSearch, issueCategory, catalogSearch, catalogCategoryFilter])
+
+    // Refetch what the open tab shows when the server reports a change to it
+    useQueueEvents((queues) => {
+        const resync = queues.has('resync')
+        if (activeTab === 'verification' && (resync || queues.has('store-pending'))) fetchPending()
+        if (activeTab === 'inventory' && (resync || queues.has('store-items'))) fetchStoreItems()
+        if (activeTab === 'records' && (resync || queues.has('issue-history'))) fetchIssueHistory()
+        if (['verification', 'master', 'issue'].includes(activeTab) && (resync || queues.has('materials'))) {
+            fetchMaterials()
+        }
+    })
+
     // Auto-populate material details when material selected
     const handleMaterialSelect = (materialId) => {
         const mat = materials.find(m => m.id === parseInt(materialId))
@@ -270,7 +269,8 @@ const StoreDashboard = () => {
                                     </div>
 
                                     {/* 2. Material Details */}
-                                    <div style={{ gridColumn: '1/-1', display: 'grid', gridTemplateColumns: '1fr 1fr', gap: '1rem', marginTop: '1rem' }}>
+                                    <div style={{ gridColumn: '1/-1', display: 'grid', gridTemplateColumns: '1fr 1fr 1fr', gap: '1rem', marginTop: '1rem' }}>
+                                        <input className="glass-input" placeholder="Search Material Name or Code..." value={materialSearch} onChange={e => setMaterialSearch(e.target.value)} />
                                         <select className="glass-input" required value={verifData.material_id} onChange={e => handleMaterialSelect(e.target.value)}>
                                             <option value="">Select Official Material Code</option>
                                             {materials.map(m => <option key={m.id} value={m.id}>{m.code} - {m.name}</option>)}
@@ -340,6 +340,7 @@ const StoreDashboard = () => {
                                 </table>
                             )
                         )}
+                        {!selectedItem && <LoadMoreButton list={pendingList} />}
                     </>
                 )}
 
@@ -347,6 +348,7 @@ const StoreDashboard = () => {
                     <>
                         <h3 style={{ marginBottom: '1rem' }}>Live Store Inventory</h3>
                         <StoreInventoryTable items={storeItems} userRole="STORE_MANAGER" />
+                        <LoadMoreButton list={storeItemList} />
                     </>
                 )}
 
@@ -390,13 +392,13 @@ const StoreDashboard = () => {
                             </div>
                         </div>
 
-                        {materials.length === 0 ? (
+                        {materials.length === 0 && (catalogSearch || catalogCategoryFilter) ? (
                             <div style={{ padding: '2rem', textAlign: 'center', color: 'var(--text-muted)' }}>
-                                No materials available yet.
+                                No materials match your search.
                             </div>
-                        ) : filteredCatalog.length === 0 ? (
+                        ) : materials.length === 0 ? (
                             <div style={{ padding: '2rem', textAlign: 'center', color: 'var(--text-muted)' }}>
-                                No materials match your search.
+                                No materials available yet.
                             </div>
                         ) : (
                             <table>
@@ -412,7 +414,7 @@ const StoreDashboard = () => {
                                     </tr>
                                 </thead>
                                 <tbody>
-                                    {filteredCatalog.map(m => {
+                                    {materials.map(m => {
                                         const deviation = m.min_stock_level > 0
                                             ? ((m.current_stock - m.min_stock_level) / m.min_stock_level) * 100
                                             : 0;
@@ -440,6 +442,7 @@ const StoreDashboard = () => {
                                 </tbody>
                             </table>
                         )}
+                        <LoadMoreButton list={materialList} />
                     </>
                 )}
 
@@ -483,7 +486,7 @@ const StoreDashboard = () => {
                                 <label style={{ display: 'block', marginBottom: '0.5rem', fontSize: '0.9rem' }}>Select Material</label>
                                 <select className="glass-input" required value={issueForm.material_id} onChange={e => setIssueForm({ ...issueForm, material_id: e.target.value })}>
                                     <option value="">-- Select Material --</option>
-                                    {filteredMaterials.map(m => (
+                                    {materials.map(m => (
                                         <option key={m.id} value={m.id}>
                                             {m.code} - {m.name} (Stock: {m.current_stock} {m.unit})
                                         </option>
@@ -560,7 +563,7 @@ const StoreDashboard = () => {
                 {activeTab === 'records' && (
                     <>
                         <h3 style={{ marginBottom: '1.5rem' }}>Material Issue Records</h3>
-                        {loading ? (
+                        {issueRecordList.loading && issueRecords.length === 0 ? (
                             <p>Loading...</p>
                         ) : issueRecords.length === 0 ? (
                             <div style={{ padding: '2rem', textAlign: 'center', color: 'var(--text-muted)' }}>
@@ -618,6 +621,7 @@ const StoreDashboard = () => {
                                 </tbody>
                             </table>
                         )}
+                        <LoadMoreButton list={issueRecordList} />
                     </>
                 )}
             </div>
@@ -15,6 +15,7 @@ export default defineConfig({
             '/store': { target: 'http://127.0.0.1:8000', changeOrigin: true },
             '/issue': { target: 'http://127.0.0.1:8000', changeOrigin: true },
             '/materials': { target: 'http://127.0.0.1:8000', changeOrigin: true },
+            '/events': { target: 'http://127.0.0.1:8000', changeOrigin: true },
         }
     }
 })
@@ -158,7 +158,7 @@ def main():
         print("1. Commit your changes")
         print("2. Push to your deployment platform")
         print("3. Run 'python backend/init_prod_db.py' on production")
-        print("4. Check /health endpoint")
+        print("4. Check /health/ready endpoint")
         return 0
     else:
         print("\n⚠️  Some checks failed. Fix the issues before deploying.")
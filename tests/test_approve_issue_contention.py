@@ -0,0 +1,21 @@
+"""
+Several processes (standing in for uvicorn workers) race to approve the same issues of
+one material whose stock cannot cover all of them; nothing may be lost or oversold.
+The race and its checks are benchmarks/contention_approve_issue.py at a smaller size.
+"""
+import multiprocessing
+
+from benchmarks import contention_approve_issue as contention
+
+WORKERS = 4
+ISSUES = 60
+
+
+def test_concurrent_approvals_lose_nothing(client):
+    stock = ISSUES  # about half of the requested quantity
+    material_id, issue_ids = contention.create_issues(ISSUES, stock)
+
+    approved = contention.race(WORKERS, issue_ids, multiprocessing.get_context("fork"))
+
+    assert approved, "no issue was approved"
+    assert contention.check(material_id, issue_ids, stock, approved) == []
@@ -0,0 +1,183 @@
+"""
+Lot allocation of approved issues (FIFO / FEFO) and quantity corrections of received lots.
+"""
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import update
+
+from backend import lots, models
+
+
+@pytest.fixture(scope="module")
+def users(client, login):
+    users = {
+        "security": login("security", "sec123"),
+        "store": login("store", "store123"),
+        "officer": login("officer", "off123"),
+    }
+    users["officer_id"] = client.get("/users/me", headers=users["officer"]).json()["id"]
+    return users
+
+
+@pytest.fixture
+def db(client):
+    from backend.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+
+def _material(client, users):
+    response = client.post("/materials", headers=users["officer"], json={
+        "code": f"LOT-{uuid.uuid4().hex[:8]}", "name": "Lot test", "category": "SPARE", "unit": "Nos",
+    })
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _receive(client, users, material_id, quantity):
+    """Take one line of `quantity` through gate entry to final approval; returns the entry id"""
+    entry = client.post("/gate-entry/", headers=users["security"], json={
+        "vendor_name": "Lot Vendor", "request_officer_id": users["officer_id"],
+    }).json()
+    response = client.post(f"/gate-entry/{entry['id']}/approve-stage-1", headers=users["officer"], json={"action": "APPROVED"})
+    assert response.status_code == 200, response.text
+    response = client.post(f"/store/{entry['id']}/process", headers=users["store"], json={
+        "invoice_no": "INV-LOT", "invoice_date": "2024-01-01T00:00:00",
+        "items": [{"material_id": material_id, "quantity_received": quantity, "rack_no": "R1"}],
+    })
+    assert response.status_code == 200, response.text
+    response = client.post(f"/officer/{entry['id']}/final-approve", headers=users["officer"])
+    assert response.status_code == 200, response.text
+    return entry["id"]
+
+
+def _request_issue(client, users, material_id, quantity):
+    response = client.post("/issue/request", headers=users["store"], json={
+        "material_id": material_id, "quantity_requested": quantity, "purpose": "Test",
+        "requesting_dept": "Maintenance", "officer_id": users["officer_id"],
+    })
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _approve_issue(client, users, material_id, quantity):
+    issue_id = _request_issue(client, users, material_id, quantity)
+    response = client.post(f"/officer/issue/{issue_id}/approve", headers=users["officer"])
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _lot_ids(db, material_id):
+    return [lot_id for lot_id, in db.query(models.StockLot.id).filter(
+        models.StockLot.material_id == material_id
+    ).order_by(models.StockLot.id)]
+
+
+def _remaining(db, material_id):
+    db.expire_all()
+    return [remaining for remaining, in db.query(models.StockLot.quantity_remaining).filter(
+        models.StockLot.material_id == material_id
+    ).order_by(models.StockLot.id)]
+
+
+def test_issue_spans_lots_oldest_receipt_first(client, users, db):
+    material_id = _material(client, users)
+    for quantity in (5, 5, 5):
+        _receive(client, users, material_id, quantity)
+    first, second, third = _lot_ids(db, material_id)
+
+    issued = _approve_issue(client, users, material_id, 7)
+
+    assert [(pick["lot_id"], pick["quantity"]) for pick in issued["picks"]] == [(first, 5), (second, 2)]
+    assert issued["unallocated_qty"] == 0
+    assert _remaining(db, material_id) == [0, 3, 5]
+    # The next issue picks up where the last one stopped, skipping the emptied lot
+    issued = _approve_issue(client, users, material_id, 4)
+    assert [(pick["lot_id"], pick["quantity"]) for pick in issued["picks"]] == [(second, 3), (third, 1)]
+
+
+def test_fefo_takes_earliest_expiry_first_and_fifo_ignores_expiry(client, users, db):
+    material_id = _material(client, users)
+    for quantity in (4, 4, 4):
+        _receive(client, users, material_id, quantity)
+    oldest, middle, newest = _lot_ids(db, material_id)
+    # The newest receipt expires first; the oldest has no expiry date at all
+    db.execute(update(models.StockLot).where(models.StockLot.id == newest).values(expiry_date=datetime(2030, 1, 1)))
+    db.execute(update(models.StockLot).where(models.StockLot.id == middle).values(expiry_date=datetime(2031, 1, 1)))
+    db.commit()
+    issue_id = _request_issue(client, users, material_id, 10)
+
+    def remaining_after(policy):
+        # Allocated in this session only; rolled back so both policies start from full lots
+        try:
+            assert lots.allocate(db, issue_id, material_id, 10, policy) == 0
+            return [(lot_id, remaining) for lot_id, remaining in db.query(
+                models.StockLot.id, models.StockLot.quantity_remaining
+            ).filter(models.StockLot.material_id == material_id).order_by(models.StockLot.id)]
+        finally:
+            db.rollback()
+
+    assert remaining_after("FEFO") == [(oldest, 2), (middle, 0), (newest, 0)]
+    assert remaining_after("FIFO") == [(oldest, 0), (middle, 0), (newest, 2)]
+    with pytest.raises(ValueError):
+        lots.allocate(db, issue_id, material_id, 10, "LIFO")
+
+
+def test_stock_without_lots_is_reported_unallocated(client, users, db):
+    material_id = _material(client, users)
+    _receive(client, users, material_id, 3)
+    (lot_id,) = _lot_ids(db, material_id)
+    # Stock from before lot tracking: counted in current_stock, backed by no lot
+    db.execute(update(models.Material).where(models.Material.id == material_id).values(
+        current_stock=models.Material.current_stock + 4
+    ))
+    db.commit()
+
+    issued = _approve_issue(client, users, material_id, 5)
+
+    assert issued["status"] == "APPROVED"
+    assert [(pick["lot_id"], pick["quantity"]) for pick in issued["picks"]] == [(lot_id, 3)]
+    assert issued["unallocated_qty"] == 2
+    assert _remaining(db, material_id) == [0]
+    issued = _approve_issue(client, users, material_id, 2)
+    assert issued["picks"] == []
+    assert issued["unallocated_qty"] == 2
+
+
+def _correct_quantity(client, users, entry_id, item_id, quantity):
+    return client.put(f"/officer/{entry_id}/verification-details", headers=users["officer"], json={
+        "items": [{"id": item_id, "quantity_received": quantity}],
+    })
+
+
+def test_correction_below_issued_quantity_is_rejected(client, users, db):
+    material_id = _material(client, users)
+    entry_id = _receive(client, users, material_id, 10)
+    (lot_id,) = _lot_ids(db, material_id)
+    _approve_issue(client, users, material_id, 8)
+
+    response = _correct_quantity(client, users, entry_id, lot_id, 5)
+
+    assert response.status_code == 409, response.text
+    db.expire_all()
+    assert db.get(models.InwardItem, lot_id).quantity_received == 10
+    assert db.get(models.Material, material_id).current_stock == 2
+    assert _remaining(db, material_id) == [2]
+
+    response = _correct_quantity(client, users, entry_id, lot_id, 12)
+
+    assert response.status_code == 200, response.text
+    db.expire_all()
+    assert db.get(models.Material, material_id).current_stock == 4
+    assert _remaining(db, material_id) == [4]
+    adjustment = db.query(models.InventoryLog).filter(
+        models.InventoryLog.material_id == material_id, models.InventoryLog.transaction_type == "ADJUSTMENT"
+    ).one()
+    assert (adjustment.change_quantity, adjustment.balance_after) == (2, 4)
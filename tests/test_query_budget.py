@@ -0,0 +1,78 @@
+"""
+Statement budgets for the write paths that used to issue one query per line item.
+The budgets hold for any number of lines, so an N+1 regression fails here first.
+"""
+import uuid
+
+import pytest
+
+from backend.instrumentation import query_budget
+
+LINES = 20
+
+
+@pytest.fixture(scope="module")
+def users(login):
+    return {
+        "security": login("security", "sec123"),
+        "store": login("store", "store123"),
+        "officer": login("officer", "off123"),
+    }
+
+
+def _entry_pending_final_approval(client, users):
+    officer_id = client.get("/users/me", headers=users["officer"]).json()["id"]
+    batch = uuid.uuid4().hex[:8]
+    material_ids = [
+        client.post("/materials", headers=users["officer"], json={
+            "code": f"BUDGET-{batch}-{i}",
+            "name": f"Budget {i}", "category": "SPARE", "unit": "Nos",
+        }).json()["id"]
+        for i in range(LINES)
+    ]
+    entry = client.post("/gate-entry/", headers=users["security"], json={
+        "vendor_name": "Budget Vendor", "request_officer_id": officer_id,
+    }).json()
+    response = client.post(f"/gate-entry/{entry['id']}/approve-stage-1", headers=users["officer"], json={"action": "APPROVED"})
+    assert response.status_code == 200, response.text
+    response = client.post(f"/store/{entry['id']}/process", headers=users["store"], json={
+        "invoice_no": "INV-BUDGET", "invoice_date": "2024-01-01T00:00:00",
+        "items": [{"material_id": material_id, "quantity_received": 5, "rack_no": "R1"} for material_id in material_ids],
+    })
+    assert response.status_code == 200, response.text
+    return entry["id"]
+
+
+def test_final_approve_statement_budget(client, users):
+    entry_id = _entry_pending_final_approval(client, users)
+    with query_budget(16):
+        response = client.post(f"/officer/{entry_id}/final-approve", headers=users["officer"])
+    assert response.status_code == 200, response.text
+
+
+def test_query_budget_fails_when_exceeded(client):
+    with pytest.raises(AssertionError, match="exceed the budget of 0"):
+        with query_budget(0):
+            client.get("/materials")
+
+
+def test_metrics_require_admin(client, login):
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers=login("store", "store123")).status_code == 403
+    response = client.get("/metrics", headers=login("admin", "admin123"))
+    assert response.status_code == 200
+    assert "store_db_statements_per_request_bucket" in response.text
+
+
+def test_failed_statement_is_counted_and_leaves_no_timer_behind(client):
+    from sqlalchemy import exc, text
+
+    from backend.database import engine
+    from backend.instrumentation import track
+
+    with engine.connect() as connection, track() as stats:
+        with pytest.raises(exc.OperationalError):
+            connection.execute(text("SELECT * FROM no_such_table"))
+        connection.execute(text("SELECT 1"))
+        assert not connection.info.get("query_started")
+    assert stats.statements == 2